@@ -17,7 +17,13 @@ import { useToast } from "@/hooks/use-toast";
 import { UserRound } from "lucide-react";
 import Link from "next/link";
 import { useRouter } from "next/navigation";
-import { type FormEvent, useCallback, useEffect, useState } from "react";
+import {
+	type FormEvent,
+	useCallback,
+	useEffect,
+	useRef,
+	useState,
+} from "react";
 import PostItem, { type FetchedPost } from "./PostItem";
 
 interface UserProfile {
@@ -41,6 +47,7 @@ interface PaginatedResponse {
 	total: number;
 	limit: number;
 	offset: number;
+	next_cursor: string | null;
 }
 
 export default function HomePage() {
@@ -56,6 +63,8 @@ export default function HomePage() {
 	const [isLoggingOut, setIsLoggingOut] = useState(false);
 	const [currentPage, setCurrentPage] = useState(1);
 	const [totalPosts, setTotalPosts] = useState(0);
+	// cursors.current[n] is where page n + 1 starts, the first page has none
+	const cursors = useRef<(string | null)[]>([null]);
 	const postsPerPage = 10;
 
 	const router = useRouter();
@@ -83,9 +92,12 @@ export default function HomePage() {
 			setIsLoadingPosts(true);
 			setErrorLoadingPosts(null);
 			try {
-				const offset = (page - 1) * postsPerPage;
+				const cursor = cursors.current[page - 1];
+				const position = cursor
+					? `cursor=${encodeURIComponent(cursor)}`
+					: `offset=${(page - 1) * postsPerPage}`;
 				const response = await fetch(
-					`${backendUrl}/posts/?limit=${postsPerPage}&offset=${offset}`,
+					`${backendUrl}/posts/?limit=${postsPerPage}&${position}`,
 					{
 						method: "GET",
 						headers: {
@@ -114,6 +126,7 @@ export default function HomePage() {
 				const data: PaginatedResponse = await response.json();
 				setPosts(data.items);
 				setTotalPosts(data.total);
+				cursors.current[page] = data.next_cursor;
 			} catch (error: unknown) {
 				console.error("failed to fetch posts: ", error);
 				const message =
@@ -0,0 +1,70 @@
+"""
+Throughput of a feed page query on the async stack against the sync
+Session(engine) path the routes used before, where every request held a
+threadpool thread for its whole database round trip.
+
+    python -m benchmarks.async_stack --posts 100000 --requests 2000
+
+--latency-ms adds a pg_sleep to every request to stand in for the network
+round trip to a database on another host, which is where a blocked thread
+costs the most. The pools use the DB_POOL_* settings, DB_POOL_PRE_PING=false
+leaves out the pre-ping, which costs the async path two more round trips
+than the sync one on every checkout.
+"""
+
+import argparse
+import asyncio
+from functools import partial
+from sqlalchemy import func, select
+from sqlmodel import Session
+from starlette.concurrency import run_in_threadpool
+from benchmarks.common import reset_database, run_concurrently, seed, summarize
+from src.db import async_engine, async_session, engine
+from src.routes.posts import feed_page, select_posts
+
+
+LATENCY_SECONDS = 0.0
+
+
+def sync_page(offset: int) -> None:
+    with Session(engine) as session:
+        if LATENCY_SECONDS:
+            session.exec(select(func.pg_sleep(LATENCY_SECONDS)))
+        session.exec(feed_page(select_posts(), 10, offset, None)).all()
+
+
+async def sync_request(i: int) -> None:
+    # what a sync def route did: the query runs on a threadpool thread
+    await run_in_threadpool(partial(sync_page, i % 100 * 10))
+
+
+async def async_request(i: int) -> None:
+    async with async_session() as session:
+        if LATENCY_SECONDS:
+            await session.exec(select(func.pg_sleep(LATENCY_SECONDS)))
+        (await session.exec(feed_page(select_posts(), 10, i % 100 * 10, None))).all()
+
+
+async def main(args) -> None:
+    for concurrency in args.concurrency:
+        for name, request in (("sync session", sync_request), ("async session", async_request)):
+            latencies, elapsed = await run_concurrently(request, concurrency, args.requests)
+            summarize(f"{name}, {concurrency} concurrent", latencies, elapsed)
+            # give the connections back, both pools together could exceed
+            # max_connections
+            engine.dispose()
+            await async_engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--posts", type=int, default=100_000)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 10, 50, 100])
+    parser.add_argument("--latency-ms", type=float, default=0)
+    args = parser.parse_args()
+    LATENCY_SECONDS = args.latency_ms / 1000
+    reset_database()
+    seed(users=args.users, posts=args.posts)
+    asyncio.run(main(args))
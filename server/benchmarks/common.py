@@ -0,0 +1,135 @@
+"""
+Shared setup for the benchmarks. They run against the Postgres database
+given by BENCH_DATABASE_URL, whose tables are dropped and reseeded, never
+point it at a database you care about. Run them from the server directory:
+
+    BENCH_DATABASE_URL=postgresql://postgres@127.0.0.1:5432/anon_bench \\
+        python -m benchmarks.<name> --help
+"""
+
+import asyncio
+import os
+import statistics
+import sys
+import time
+from typing import Awaitable, Callable, List
+from cryptography.fernet import Fernet
+
+BENCH_DATABASE_URL = os.getenv("BENCH_DATABASE_URL")
+if not BENCH_DATABASE_URL:
+    sys.exit("BENCH_DATABASE_URL is not set")
+
+# src reads its settings at import time, so they are set before importing it
+os.environ["DATABASE_URL"] = BENCH_DATABASE_URL
+os.environ.pop("READ_DATABASE_URL", None)
+os.environ.pop("ASYNC_READ_DATABASE_URL", None)
+for name, value in {
+    "JWT_SECRET_KEY": "bench-secret-bench-secret-bench-secret",
+    "GOOGLE_CLIENT_ID": "bench-client-id",
+    "GOOGLE_CLIENT_SECRET": "bench-client-secret",
+    "GOOGLE_REDIRECT_URI": "http://127.0.0.1:8000/auth/google/callback",
+    "REFRESH_TOKEN_ENCRYPTION_KEY": Fernet.generate_key().decode(),
+    "IDENTIFIER_HASH_SECRET": "bench-hash-secret",
+    "WAITLIST_SOURCE": "file",
+    "WAITLIST_FILE": os.devnull,
+}.items():
+    os.environ.setdefault(name, value)
+
+from sqlalchemy import text  # noqa: E402
+from sqlmodel import Session, SQLModel  # noqa: E402
+from src.db import engine  # noqa: E402
+
+
+def reset_database() -> None:
+    SQLModel.metadata.drop_all(engine)
+    SQLModel.metadata.create_all(engine)
+
+
+def seed(users: int = 0, posts: int = 0, votes_per_post: int = 0) -> None:
+    """
+    Fill the tables with generate_series, which is fast enough for millions
+    of rows. Votes go to the first votes_per_post users, with the post
+    counters set to match.
+    """
+    with Session(engine) as session:
+        session.exec(
+            text(
+                """
+                INSERT INTO "user" (username, google_id, referral_count, token_version)
+                SELECT 'user' || g, 'google' || g, 0, 0 FROM generate_series(1, :users) g
+                """
+            ).bindparams(users=users)
+        )
+        session.exec(
+            text(
+                """
+                INSERT INTO post (content, author_id, created_at, deleted, score,
+                                  upvotes, downvotes, hot_rank)
+                SELECT 'post ' || g, 1 + g % :users,
+                       now() - g * interval '1 minute', g % 50 = 0, 0, 0, 0, 0
+                FROM generate_series(1, :posts) g
+                """
+            ).bindparams(users=max(users, 1), posts=posts)
+        )
+        if votes_per_post:
+            session.exec(
+                text(
+                    """
+                    INSERT INTO vote (user_id, post_id, vote_type)
+                    SELECT u, p, CASE WHEN (u + p) % 3 = 0 THEN -1 ELSE 1 END
+                    FROM generate_series(1, :posts) p, generate_series(1, :votes) u
+                    """
+                ).bindparams(posts=posts, votes=votes_per_post)
+            )
+            session.exec(
+                text(
+                    """
+                    UPDATE post SET score = v.score, upvotes = v.up, downvotes = v.down
+                    FROM (
+                        SELECT post_id, SUM(vote_type) AS score,
+                               COUNT(*) FILTER (WHERE vote_type = 1) AS up,
+                               COUNT(*) FILTER (WHERE vote_type = -1) AS down
+                        FROM vote GROUP BY post_id
+                    ) v
+                    WHERE post.id = v.post_id
+                    """
+                )
+            )
+        session.commit()
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+        connection.execute(text("VACUUM ANALYZE"))
+
+
+def summarize(name: str, latencies: List[float], elapsed: float) -> None:
+    """Print throughput and latency percentiles of one run, in milliseconds"""
+    ordered = sorted(latencies)
+
+    def percentile(p: float) -> float:
+        return ordered[min(len(ordered) - 1, int(len(ordered) * p))] * 1000
+
+    print(
+        f"{name:<40} n={len(ordered):<7} {len(ordered) / elapsed:>9.1f}/s "
+        f"mean={statistics.fmean(ordered) * 1000:7.2f}ms "
+        f"p50={percentile(0.50):7.2f}ms p99={percentile(0.99):7.2f}ms"
+    )
+
+
+async def run_concurrently(
+    operation: Callable[[int], Awaitable[None]], concurrency: int, total: int
+) -> tuple:
+    """
+    Run operation total times from concurrency workers, returns the latency
+    of every call and the wall time of the whole run
+    """
+    latencies: List[float] = []
+    remaining = iter(range(total))
+
+    async def worker() -> None:
+        for i in remaining:
+            started = time.perf_counter()
+            await operation(i)
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return latencies, time.perf_counter() - started
@@ -0,0 +1,99 @@
+"""
+Vote latency under concurrent voting on one hot post, for the read, write,
+commit, SUM sequence set_vote used to run and the single upsert statement
+it runs now.
+
+    python -m benchmarks.hot_post_votes --voters 20000 --requests 5000
+
+Every run starts from a freshly seeded database. Set SCORE_SHARDS to
+measure the sharded counters instead of the post row.
+"""
+
+import argparse
+import asyncio
+import random
+from datetime import datetime, timezone
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
+from benchmarks.common import reset_database, run_concurrently, seed, summarize
+from src.db import async_engine, async_session
+from src.models.post import Post
+from src.models.vote import Vote
+from src.services.votes import apply_vote_change
+from sqlmodel import select
+
+HOT_POST_ID = 1
+
+
+async def old_vote(user_id: int, vote_type: int) -> None:
+    # the set_vote route before the upsert
+    async with async_session() as session:
+        post = (
+            await session.exec(
+                select(Post).where(Post.id == HOT_POST_ID).where(Post.deleted == False)
+            )
+        ).first()
+        assert post is not None
+        existing_vote = (
+            await session.exec(
+                select(Vote).where(Vote.user_id == user_id).where(Vote.post_id == HOT_POST_ID)
+            )
+        ).first()
+        if existing_vote:
+            if existing_vote.vote_type != vote_type:
+                existing_vote.vote_type = vote_type
+                existing_vote.updated_at = datetime.now(timezone.utc)
+                session.add(existing_vote)
+        else:
+            session.add(Vote(user_id=user_id, post_id=HOT_POST_ID, vote_type=vote_type))
+        await session.commit()
+        (
+            await session.exec(
+                select(func.coalesce(func.sum(Vote.vote_type), 0)).where(
+                    Vote.post_id == HOT_POST_ID
+                )
+            )
+        ).first()
+
+
+async def new_vote(user_id: int, vote_type: int) -> None:
+    async with async_session() as session:
+        assert await apply_vote_change(session, user_id, HOT_POST_ID, vote_type) is not None
+        await session.commit()
+
+
+async def run(name: str, vote, args) -> None:
+    failures = 0
+
+    async def request(i: int) -> None:
+        nonlocal failures
+        # a fifth of the votes come from voters without a vote on the post yet
+        if random.random() < 0.2:
+            user_id = args.voters + 1 + random.randrange(args.voters)
+        else:
+            user_id = 1 + random.randrange(args.voters)
+        try:
+            await vote(user_id, random.choice((1, -1)))
+        except IntegrityError:
+            # concurrent first votes racing on unique_user_post_vote
+            failures += 1
+
+    latencies, elapsed = await run_concurrently(request, args.concurrency, args.requests)
+    summarize(f"{name}, {args.concurrency} concurrent", latencies, elapsed)
+    if failures:
+        print(f"{'':<40} {failures} requests failed on unique_user_post_vote")
+    await async_engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--voters", type=int, default=20_000, help="existing votes on the hot post")
+    parser.add_argument("--posts", type=int, default=10)
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    args = parser.parse_args()
+    for name, vote in (("read, write, commit, sum", old_vote), ("upsert returning score", new_vote)):
+        reset_database()
+        # every post gets a vote from each of the first --voters users
+        seed(users=args.voters * 2, posts=args.posts, votes_per_post=args.voters)
+        asyncio.run(run(name, vote, args))
@@ -0,0 +1,212 @@
+"""
+Login storm against a local stub of Google's token and certs endpoints, for
+the callback as it was (a new httpx client per token exchange, certs fetched
+again by google.oauth2.id_token on every login) and as it is now (the shared
+http_client and the cached google_certs).
+
+    python -m benchmarks.oauth_callback --logins 2000 --concurrency 20
+
+The stub serves TLS with a throwaway certificate, so the handshakes a new
+client pays for are part of the numbers. --latency-ms delays every stub
+response to stand in for the distance to Google. No database is needed.
+"""
+
+import argparse
+import asyncio
+import datetime
+import ipaddress
+import json
+import os
+import ssl
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# nothing here connects, src only needs a database url to import
+os.environ.setdefault("BENCH_DATABASE_URL", "postgresql://bench@127.0.0.1/unused")
+
+import httpx  # noqa: E402
+from cryptography import x509  # noqa: E402
+from cryptography.hazmat.primitives import hashes, serialization  # noqa: E402
+from cryptography.hazmat.primitives.asymmetric import rsa  # noqa: E402
+from cryptography.x509.oid import NameOID  # noqa: E402
+from google.auth import crypt  # noqa: E402
+from google.auth import jwt as google_jwt  # noqa: E402
+from google.auth.transport import requests as google_requests  # noqa: E402
+from google.oauth2 import id_token  # noqa: E402
+from starlette.concurrency import run_in_threadpool  # noqa: E402
+from benchmarks.common import run_concurrently, summarize  # noqa: E402
+from src.services.google_certs import google_certs  # noqa: E402
+from src.services.http_client import http_client  # noqa: E402
+
+CLIENT_ID = "bench-client-id"
+KEY_ID = "bench-key"
+
+
+def self_signed(key, common_name: str, san=None) -> x509.Certificate:
+    name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, common_name)])
+    now = datetime.datetime.now(datetime.timezone.utc)
+    builder = (
+        x509.CertificateBuilder()
+        .subject_name(name)
+        .issuer_name(name)
+        .public_key(key.public_key())
+        .serial_number(x509.random_serial_number())
+        .not_valid_before(now - datetime.timedelta(days=1))
+        .not_valid_after(now + datetime.timedelta(days=1))
+    )
+    if san is not None:
+        builder = builder.add_extension(san, critical=False)
+    return builder.sign(key, hashes.SHA256())
+
+
+def pem(certificate: x509.Certificate) -> bytes:
+    return certificate.public_bytes(serialization.Encoding.PEM)
+
+
+class StubGoogle(ThreadingHTTPServer):
+    """Token and certs endpoints, signing id tokens with a local key"""
+
+    daemon_threads = True
+
+    def __init__(self, latency: float):
+        super().__init__(("127.0.0.1", 0), StubHandler)
+        self.latency = latency
+        self.counts_lock = threading.Lock()
+        self.connections = 0
+        self.cert_fetches = 0
+        signing_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+        self.signer = crypt.RSASigner.from_string(
+            signing_key.private_bytes(
+                serialization.Encoding.PEM,
+                serialization.PrivateFormat.PKCS8,
+                serialization.NoEncryption(),
+            ),
+            key_id=KEY_ID,
+        )
+        self.certs = json.dumps(
+            {KEY_ID: pem(self_signed(signing_key, "bench signing key")).decode()}
+        ).encode()
+
+        tls_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+        san = x509.SubjectAlternativeName([x509.IPAddress(ipaddress.ip_address("127.0.0.1"))])
+        tls_dir = tempfile.mkdtemp()
+        self.ca_file = os.path.join(tls_dir, "cert.pem")
+        key_file = os.path.join(tls_dir, "key.pem")
+        with open(self.ca_file, "wb") as f:
+            f.write(pem(self_signed(tls_key, "127.0.0.1", san)))
+        with open(key_file, "wb") as f:
+            f.write(
+                tls_key.private_bytes(
+                    serialization.Encoding.PEM,
+                    serialization.PrivateFormat.PKCS8,
+                    serialization.NoEncryption(),
+                )
+            )
+        context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        context.load_cert_chain(self.ca_file, key_file)
+        self.socket = context.wrap_socket(self.socket, server_side=True)
+
+    @property
+    def url(self) -> str:
+        return f"https://127.0.0.1:{self.server_address[1]}"
+
+    def id_token(self) -> bytes:
+        now = int(time.time())
+        return google_jwt.encode(
+            self.signer,
+            {
+                "iss": "https://accounts.google.com",
+                "aud": CLIENT_ID,
+                "sub": "1234567890",
+                "email": "someone@example.com",
+                "email_verified": True,
+                "iat": now,
+                "exp": now + 3600,
+            },
+        )
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def setup(self) -> None:
+        super().setup()
+        with self.server.counts_lock:
+            self.server.connections += 1
+
+    def send(self, body: bytes, cache_control: str = "no-store") -> None:
+        time.sleep(self.server.latency)
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Cache-Control", cache_control)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self) -> None:
+        with self.server.counts_lock:
+            self.server.cert_fetches += 1
+        self.send(self.server.certs, "public, max-age=3600")
+
+    def do_POST(self) -> None:
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        body = {"access_token": "access", "id_token": self.server.id_token().decode()}
+        self.send(json.dumps(body).encode())
+
+    def log_message(self, *args) -> None:
+        pass
+
+
+async def old_login(stub: StubGoogle) -> None:
+    async with httpx.AsyncClient() as client:
+        response = await client.post(f"{stub.url}/token", data={"code": "code"})
+        response.raise_for_status()
+    token = response.json()["id_token"]
+    await run_in_threadpool(
+        id_token.verify_token,
+        token,
+        google_requests.Request(),
+        CLIENT_ID,
+        certs_url=f"{stub.url}/certs",
+    )
+
+
+async def new_login(stub: StubGoogle) -> None:
+    response = await http_client.post(f"{stub.url}/token", data={"code": "code"})
+    response.raise_for_status()
+    await google_certs.verify_id_token(response.json()["id_token"], CLIENT_ID)
+
+
+async def main(stub: StubGoogle) -> None:
+    # httpx and requests both trust the stub's certificate through these
+    os.environ["SSL_CERT_FILE"] = os.environ["REQUESTS_CA_BUNDLE"] = stub.ca_file
+    http_client.start()
+    google_certs.url = f"{stub.url}/certs"
+    for name, login in (
+        ("new client, certs per login", old_login),
+        ("shared client, cached certs", new_login),
+    ):
+        stub.connections = stub.cert_fetches = 0
+        latencies, elapsed = await run_concurrently(
+            lambda i: login(stub), ARGS.concurrency, ARGS.logins
+        )
+        summarize(name, latencies, elapsed)
+        print(
+            f"{'':<40} {stub.connections} connections, "
+            f"{stub.cert_fetches} cert fetches for {ARGS.logins} logins"
+        )
+    await http_client.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--logins", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--latency-ms", type=float, default=20)
+    ARGS = parser.parse_args()
+
+    stub = StubGoogle(ARGS.latency_ms / 1000)
+    threading.Thread(target=stub.serve_forever, daemon=True).start()
+    asyncio.run(main(stub))
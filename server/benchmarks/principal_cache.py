@@ -0,0 +1,84 @@
+"""
+GET /users/me through the app with the principal cache enabled and disabled,
+counting the statements every request sends to the database.
+
+    python -m benchmarks.principal_cache --users 1000 --requests 5000
+
+The requests go through httpx's ASGI transport, so the numbers are the
+app's own cost without a network or a server in front.
+"""
+
+import argparse
+import asyncio
+import contextlib
+import os
+from datetime import datetime, timedelta, timezone
+import httpx
+import jwt
+from sqlalchemy import event
+from benchmarks.common import reset_database, run_concurrently, seed, summarize
+from src.db import async_engine
+from src.main import app
+from src.services.auth import principal_cache, token_versions
+
+
+def access_token(user_id: int) -> str:
+    return jwt.encode(
+        {
+            "sub": str(user_id),
+            "ver": 0,
+            "exp": datetime.now(timezone.utc) + timedelta(hours=1),
+        },
+        os.environ["JWT_SECRET_KEY"],
+        algorithm="HS256",
+    )
+
+
+async def run(client: httpx.AsyncClient, tokens: list, name: str) -> None:
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    async def request(i: int) -> None:
+        response = await client.get(
+            "/users/me", cookies={"access_token": tokens[i % len(tokens)]}
+        )
+        assert response.status_code == 200, response.text
+
+    event.listen(async_engine.sync_engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        # get_current_user prints a line per request
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            latencies, elapsed = await run_concurrently(
+                request, ARGS.concurrency, ARGS.requests
+            )
+    finally:
+        event.remove(async_engine.sync_engine, "before_cursor_execute", before_cursor_execute)
+    summarize(name, latencies, elapsed)
+    print(f"{'':<40} {len(statements) / ARGS.requests:.3f} statements per request")
+
+
+async def main() -> None:
+    tokens = [access_token(user_id) for user_id in range(1, ARGS.users + 1)]
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        principal_cache.enabled = False
+        await run(client, tokens, "principal cache disabled")
+        principal_cache.enabled = True
+        principal_cache.clear()
+        token_versions.clear()
+        # the first request of every user fills the cache, one query each
+        await run(client, tokens, "principal cache enabled")
+    await async_engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=10)
+    ARGS = parser.parse_args()
+    reset_database()
+    seed(users=ARGS.users)
+    asyncio.run(main())
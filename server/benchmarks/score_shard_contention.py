@@ -0,0 +1,95 @@
+"""
+Lock waits while voting concurrently on one hot post, with the score kept
+on the post row (SCORE_SHARDS=0) and spread over score shards.
+
+    python -m benchmarks.score_shard_contention --shards 0 8 32
+
+SCORE_SHARDS is read when src is imported, so every setting runs in its own
+process. pg_stat_activity is sampled from a separate connection while the
+votes run, counting the backends that wait on a lock.
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+from benchmarks.common import reset_database, run_concurrently, seed, summarize
+from sqlalchemy import text
+from src.db import async_engine, async_session, engine
+from src.services.score_shards import SCORE_SHARDS
+from src.services.votes import apply_vote_change
+
+HOT_POST_ID = 1
+
+
+class LockSampler(threading.Thread):
+    """Count the backends of this database waiting on a lock, every interval"""
+
+    def __init__(self, interval: float):
+        super().__init__(daemon=True)
+        self.interval = interval
+        self.samples = []
+        self.stopping = threading.Event()
+
+    def run(self) -> None:
+        with engine.connect() as connection:
+            while not self.stopping.wait(self.interval):
+                waiting = connection.execute(
+                    text(
+                        """
+                        SELECT count(*) FROM pg_stat_activity
+                        WHERE datname = current_database() AND wait_event_type = 'Lock'
+                        """
+                    )
+                ).scalar_one()
+                connection.rollback()
+                self.samples.append(waiting)
+
+
+async def vote(i: int) -> None:
+    async with async_session() as session:
+        user_id = 1 + random.randrange(ARGS.voters)
+        await apply_vote_change(session, user_id, HOT_POST_ID, random.choice((1, -1)))
+        await session.commit()
+
+
+async def main() -> None:
+    sampler = LockSampler(ARGS.sample_ms / 1000)
+    sampler.start()
+    latencies, elapsed = await run_concurrently(vote, ARGS.concurrency, ARGS.requests)
+    sampler.stopping.set()
+    sampler.join()
+    await async_engine.dispose()
+
+    samples = sampler.samples
+    summarize(f"SCORE_SHARDS={SCORE_SHARDS}, {ARGS.concurrency} concurrent", latencies, elapsed)
+    print(
+        f"{'':<40} lock waiters: mean={sum(samples) / len(samples):5.1f} "
+        f"max={max(samples):3} samples with any={sum(1 for n in samples if n) / len(samples):6.1%}"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--shards", type=int, nargs="+", default=[0, 8, 32])
+    parser.add_argument("--voters", type=int, default=20_000)
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--sample-ms", type=float, default=10)
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    ARGS = parser.parse_args()
+    if ARGS.worker:
+        reset_database()
+        seed(users=ARGS.voters, posts=10)
+        asyncio.run(main())
+    else:
+        for shards in ARGS.shards:
+            subprocess.run(
+                [sys.executable, "-m", "benchmarks.score_shard_contention", "--worker", *sys.argv[1:]],
+                env={**os.environ, "SCORE_SHARDS": str(shards)},
+                check=True,
+            )
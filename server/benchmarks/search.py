@@ -0,0 +1,116 @@
+"""
+Latency of /posts/search against ix_post_search_vector, next to the
+ILIKE '%q%' scan it replaces, with the plan of each query.
+
+    python -m benchmarks.search --posts 3000000
+
+Post content is drawn from a skewed vocabulary plus one code word out of
+9000 per post, so rare terms (code12345, about posts / 9000 matches) and
+common ones (exam, where ranking every match dominates) can both be
+measured.
+"""
+
+import argparse
+import asyncio
+import time
+from sqlalchemy import desc, text
+from sqlmodel import Session
+from benchmarks.common import reset_database, seed
+from src.db import async_session, engine
+from src.models.post import Post
+from src.routes.posts import search_page, select_posts_public
+
+
+# frequency falls off with the position in this list, see seed_content
+WORDS = [
+    "the", "people", "campus", "exam", "canteen", "hostel", "library",
+    "professor", "placement", "internship", "assignment", "festival",
+    "football", "midnight", "chai", "wifi", "attendance", "semester",
+    "elections", "mango", "scooter", "thesis", "lighthouse", "origami",
+]
+
+
+def seed_content() -> None:
+    """Replace the seeded post content with 12 words from WORDS and a code word"""
+    # the post.id condition keeps the subquery correlated, otherwise postgres
+    # runs it once and every post gets the same content
+    with Session(engine) as session:
+        session.exec(
+            text(
+                """
+                UPDATE post SET content = (
+                    SELECT string_agg(
+                        (:words)[1 + floor(:n * power(random(), 3))::int], ' '
+                    ) || ' code' || (10000 + post.id % 9000)
+                    FROM generate_series(1, 12)
+                    WHERE post.id IS NOT NULL
+                )
+                """
+            ).bindparams(words=WORDS, n=len(WORDS))
+        )
+        session.commit()
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+        connection.execute(text("VACUUM ANALYZE post"))
+
+
+def search_statement(q: str, limit: int):
+    return search_page(select_posts_public(None), q, limit, 0)
+
+
+def ilike_statement(q: str, limit: int):
+    return (
+        select_posts_public(None)
+        .where(Post.deleted == False)
+        .where(Post.content.ilike(f"%{q}%"))
+        .order_by(desc(Post.id))
+        .limit(limit)
+    )
+
+
+def explain(statement) -> str:
+    compiled = statement.compile(engine)
+    with engine.connect() as connection:
+        rows = connection.exec_driver_sql(
+            "EXPLAIN (ANALYZE, BUFFERS) " + str(compiled), compiled.params
+        ).all()
+    return "\n".join("    " + row[0] for row in rows)
+
+
+async def timed(statement, repeat: int) -> list:
+    latencies = []
+    for _ in range(repeat):
+        async with async_session() as session:
+            started = time.perf_counter()
+            (await session.exec(statement)).all()
+            latencies.append(time.perf_counter() - started)
+    return sorted(latencies)
+
+
+async def main(args) -> None:
+    for q in args.terms:
+        for name, statement in (
+            ("search", search_statement(q, args.limit)),
+            ("ilike", ilike_statement(q, args.limit)),
+        ):
+            latencies = await timed(statement, args.repeat)
+            print(
+                f"{name:<7} {q!r:<14} p50={latencies[len(latencies) // 2] * 1000:9.2f}ms "
+                f"max={latencies[-1] * 1000:9.2f}ms"
+            )
+            if args.explain:
+                print(explain(statement))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--posts", type=int, default=3_000_000)
+    parser.add_argument("--limit", type=int, default=10)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--terms", nargs="+", default=["code12345", "origami thesis", "exam"])
+    parser.add_argument("--explain", action="store_true", help="print EXPLAIN ANALYZE of each query")
+    args = parser.parse_args()
+    reset_database()
+    seed(users=args.users, posts=args.posts)
+    seed_content()
+    asyncio.run(main(args))
@@ -0,0 +1,103 @@
+"""
+Cost of turning one page of post rows into a response body, for the
+validated path the post routes used before and the model_construct plus
+fast_response path they use now. No database is needed.
+
+    python -m benchmarks.serialization --limit 50
+"""
+
+import argparse
+import asyncio
+import os
+import time
+from datetime import datetime, timedelta, timezone
+
+# nothing here connects, src only needs a database url to import
+os.environ.setdefault("BENCH_DATABASE_URL", "postgresql://bench@127.0.0.1/unused")
+
+from fastapi.responses import JSONResponse  # noqa: E402
+from fastapi.routing import APIRoute, serialize_response  # noqa: E402
+from benchmarks.common import summarize  # noqa: E402
+from src.models.post import Author, Post, PostPublic  # noqa: E402
+from src.models.user import User  # noqa: E402
+from src.routes.posts import PaginatedResponse, create_post_public, router  # noqa: E402
+from src.services.responses import fast_response  # noqa: E402
+
+
+def make_rows(limit: int) -> list:
+    """Rows shaped like select_posts_public results"""
+    now = datetime.now(timezone.utc)
+    rows = []
+    for i in range(limit):
+        author = User(id=i % 7, username=f"user{i % 7}", avatar_seed=f"seed{i % 7}")
+        post = Post(
+            id=10_000 - i,
+            content="an anonymous post of a typical length " * 6,
+            author_id=author.id,
+            created_at=now - timedelta(minutes=i),
+            score=i * 3 - 20,
+        )
+        rows.append((post, author, post.score, (1, -1, None)[i % 3]))
+    return rows
+
+
+def feed_field():
+    for route in router.routes:
+        if isinstance(route, APIRoute) and route.path == "/" and "GET" in route.methods:
+            return route.response_field
+
+
+async def validated_page(rows: list, field) -> bytes:
+    # PostPublic(**post.model_dump(), ...) per row, then FastAPI validates the
+    # returned page against response_model and encodes it with json. score is
+    # excluded because post had no score column back then
+    items = [
+        PostPublic(
+            **post.model_dump(exclude={"score"}),
+            author=Author(
+                author_id=author.id, username=author.username, avatar_seed=author.avatar_seed
+            ),
+            score=score,
+            user_vote=user_vote,
+        )
+        for post, author, score, user_vote in rows
+    ]
+    page = PaginatedResponse[PostPublic](items=items, total=1000, limit=len(rows), offset=0)
+    content = await serialize_response(field=field, response_content=page)
+    return JSONResponse(content).body
+
+
+async def constructed_page(rows: list, field) -> bytes:
+    page = PaginatedResponse.model_construct(
+        items=[create_post_public(*row) for row in rows],
+        total=1000,
+        limit=len(rows),
+        offset=0,
+        next_cursor=None,
+    )
+    return fast_response(page).body
+
+
+async def main(args) -> None:
+    rows = make_rows(args.limit)
+    field = feed_field()
+    # both paths must send the same bytes for the comparison to mean anything
+    assert await validated_page(rows, field) == await constructed_page(rows, field)
+    for name, build in (("validated", validated_page), ("model_construct", constructed_page)):
+        for _ in range(args.warmup):
+            await build(rows, field)
+        latencies = []
+        started = time.perf_counter()
+        for _ in range(args.pages):
+            page_started = time.perf_counter()
+            await build(rows, field)
+            latencies.append(time.perf_counter() - page_started)
+        summarize(f"{name}, limit={args.limit}", latencies, time.perf_counter() - started)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--limit", type=int, default=50)
+    parser.add_argument("--pages", type=int, default=5000)
+    parser.add_argument("--warmup", type=int, default=200)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,99 @@
+"""
+Score recounts and vote upserts on a large vote table, with and without
+ix_vote_post_id_user_id and optionally hash partitioned on post_id.
+
+    python -m benchmarks.vote_storage --posts 50000 --votes-per-post 1000
+
+The defaults seed 50M votes, which takes a while and a few GB of disk. The
+routes read the denormalized post.score, a recount SUMs a post's votes the
+way the score was computed before the counters and is what the index is
+for. Every vote pays for the index on insert and on flip.
+"""
+
+import argparse
+import asyncio
+import random
+from sqlalchemy import func, text
+from sqlmodel import Session, select
+from benchmarks.common import reset_database, run_concurrently, seed, summarize
+from src.db import async_engine, async_session, engine
+from src.models.vote import Vote
+from src.services.votes import apply_vote_change, partition_vote_table
+
+
+async def recount(i: int) -> None:
+    post_id = 1 + random.randrange(ARGS.posts)
+    async with async_session() as session:
+        (
+            await session.exec(
+                select(func.coalesce(func.sum(Vote.vote_type), 0)).where(
+                    Vote.post_id == post_id
+                )
+            )
+        ).one()
+
+
+async def upsert(i: int) -> None:
+    post_id = 1 + random.randrange(ARGS.posts)
+    # a fifth of the votes come from users without a vote on the post yet
+    if random.random() < 0.2:
+        user_id = ARGS.votes_per_post + 1 + random.randrange(ARGS.votes_per_post)
+    else:
+        user_id = 1 + random.randrange(ARGS.votes_per_post)
+    async with async_session() as session:
+        # every 50th seeded post is deleted, those votes return None
+        await apply_vote_change(session, user_id, post_id, random.choice((1, -1)))
+        await session.commit()
+
+
+async def measure(label: str) -> None:
+    for name, operation in (("recount", recount), ("upsert", upsert)):
+        latencies, elapsed = await run_concurrently(operation, ARGS.concurrency, ARGS.requests)
+        summarize(f"{name}, {label}", latencies, elapsed)
+    await async_engine.dispose()
+
+
+def vote_table_size() -> str:
+    with engine.connect() as connection:
+        return connection.execute(
+            text(
+                """
+                SELECT pg_size_pretty(coalesce(
+                    (SELECT sum(pg_total_relation_size(relid))
+                     FROM pg_partition_tree('vote') WHERE isleaf),
+                    pg_total_relation_size('vote')
+                ))
+                """
+            )
+        ).scalar_one()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--posts", type=int, default=50_000)
+    parser.add_argument("--votes-per-post", type=int, default=1000)
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=1)
+    parser.add_argument(
+        "--partitions", type=int, default=0, help="also measure with vote hash partitioned"
+    )
+    ARGS = parser.parse_args()
+
+    reset_database()
+    seed(users=ARGS.votes_per_post * 2, posts=ARGS.posts, votes_per_post=ARGS.votes_per_post)
+    print(f"{ARGS.posts * ARGS.votes_per_post} votes seeded, vote is {vote_table_size()}")
+    asyncio.run(measure("post_id index"))
+
+    with Session(engine) as session:
+        session.exec(text("DROP INDEX ix_vote_post_id_user_id"))
+        session.commit()
+    print(f"without ix_vote_post_id_user_id, vote is {vote_table_size()}")
+    asyncio.run(measure("no post_id index"))
+
+    if ARGS.partitions:
+        with Session(engine) as session:
+            partition_vote_table(session, ARGS.partitions)
+        with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+            connection.execute(text("VACUUM ANALYZE vote"))
+        print(f"{ARGS.partitions} partitions, vote is {vote_table_size()}")
+        asyncio.run(measure(f"{ARGS.partitions} partitions"))
@@ -9,6 +9,8 @@ from src.models.user import User
 from src.models.post import Post
 from src.models.tag import Tag
 from src.models.vote import Vote
+from src.models.counter import PostCounter
+from src.models.leaderboard import PostDailyScore
 
 # Import database configuration
 from src.db import DATABASE_URL
@@ -0,0 +1,43 @@
+"""add full text search index on post
+
+Revision ID: 1c6e9a4d8b53
+Revises: f17b4c9d3e82
+Create Date: 2026-10-18 16:47:12.905261
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '1c6e9a4d8b53'
+down_revision: Union[str, None] = 'f17b4c9d3e82'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # built concurrently so posting is not blocked while the index builds
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_post_content_search',
+            'post',
+            [sa.text("to_tsvector('english', content)")],
+            unique=False,
+            postgresql_using='gin',
+            postgresql_where=sa.text('deleted = false'),
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            'ix_post_content_search',
+            table_name='post',
+            postgresql_concurrently=True,
+        )
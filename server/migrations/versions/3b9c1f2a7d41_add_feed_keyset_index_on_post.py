@@ -0,0 +1,34 @@
+"""add feed keyset index on post
+
+Revision ID: 3b9c1f2a7d41
+Revises: 75722b3c51ce
+Create Date: 2026-10-18 10:12:04.512311
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3b9c1f2a7d41'
+down_revision: Union[str, None] = '75722b3c51ce'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index(
+        'ix_post_live_created_at_id',
+        'post',
+        ['created_at', 'id'],
+        unique=False,
+        postgresql_where=sa.text('deleted = false'),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_post_live_created_at_id', table_name='post')
@@ -0,0 +1,69 @@
+"""store post search vector
+
+Revision ID: 7e2b9c4f1a60
+Revises: d3a8f5c2b417
+Create Date: 2026-10-18 22:41:09.318204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7e2b9c4f1a60'
+down_revision: Union[str, None] = 'd3a8f5c2b417'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # ranking by ts_rank_cd(to_tsvector(content), ...) parsed the content of
+    # every match again, seconds for a common word. adding a stored generated
+    # column rewrites post under an exclusive lock, run it in a quiet window
+    op.add_column(
+        'post',
+        sa.Column(
+            'search_vector',
+            postgresql.TSVECTOR(),
+            sa.Computed("to_tsvector('english', content)", persisted=True),
+        ),
+    )
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_post_search_vector',
+            'post',
+            ['search_vector'],
+            unique=False,
+            postgresql_using='gin',
+            postgresql_where=sa.text('deleted = false'),
+            postgresql_concurrently=True,
+        )
+        op.drop_index(
+            'ix_post_content_search',
+            table_name='post',
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_post_content_search',
+            'post',
+            [sa.text("to_tsvector('english', content)")],
+            unique=False,
+            postgresql_using='gin',
+            postgresql_where=sa.text('deleted = false'),
+            postgresql_concurrently=True,
+        )
+        op.drop_index(
+            'ix_post_search_vector',
+            table_name='post',
+            postgresql_concurrently=True,
+        )
+    op.drop_column('post', 'search_vector')
@@ -0,0 +1,42 @@
+"""add live author index on post
+
+Revision ID: 9a5e3c17d2b8
+Revises: 4d7b2e91c0f6
+Create Date: 2026-10-18 18:41:09.562193
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9a5e3c17d2b8'
+down_revision: Union[str, None] = '4d7b2e91c0f6'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # built concurrently so posting is not blocked while the index builds
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_post_live_author_created_at_id',
+            'post',
+            ['author_id', 'created_at', 'id'],
+            unique=False,
+            postgresql_where=sa.text('deleted = false'),
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            'ix_post_live_author_created_at_id',
+            table_name='post',
+            postgresql_concurrently=True,
+        )
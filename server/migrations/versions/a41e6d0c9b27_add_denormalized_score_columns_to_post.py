@@ -0,0 +1,51 @@
+"""add denormalized score columns to post
+
+Revision ID: a41e6d0c9b27
+Revises: 3b9c1f2a7d41
+Create Date: 2026-10-18 11:03:47.208915
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a41e6d0c9b27'
+down_revision: Union[str, None] = '3b9c1f2a7d41'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('post', sa.Column('score', sa.Integer(), nullable=False, server_default='0'))
+    op.add_column('post', sa.Column('upvotes', sa.Integer(), nullable=False, server_default='0'))
+    op.add_column('post', sa.Column('downvotes', sa.Integer(), nullable=False, server_default='0'))
+
+    # backfill the counters from the existing votes
+    op.execute(
+        """
+        UPDATE post
+        SET score = totals.score,
+            upvotes = totals.upvotes,
+            downvotes = totals.downvotes
+        FROM (
+            SELECT post_id,
+                   SUM(vote_type) AS score,
+                   COUNT(*) FILTER (WHERE vote_type = 1) AS upvotes,
+                   COUNT(*) FILTER (WHERE vote_type = -1) AS downvotes
+            FROM vote
+            GROUP BY post_id
+        ) AS totals
+        WHERE post.id = totals.post_id
+        """
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('post', 'downvotes')
+    op.drop_column('post', 'upvotes')
+    op.drop_column('post', 'score')
@@ -0,0 +1,30 @@
+"""raise post search vector statistics
+
+Revision ID: b4d1e7a9c352
+Revises: 7e2b9c4f1a60
+Create Date: 2026-10-18 14:12:37.502913
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b4d1e7a9c352'
+down_revision: Union[str, None] = '7e2b9c4f1a60'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # a rare search term is only estimated as rare when it is in the most
+    # common elements list, which holds ten times the statistics target
+    op.execute("ALTER TABLE post ALTER COLUMN search_vector SET STATISTICS 1000")
+    op.execute("ANALYZE post")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("ALTER TABLE post ALTER COLUMN search_vector SET STATISTICS -1")
@@ -0,0 +1,43 @@
+"""add covering post index on vote
+
+Revision ID: b62f0d8e4a19
+Revises: 9a5e3c17d2b8
+Create Date: 2026-10-18 19:12:37.204816
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b62f0d8e4a19'
+down_revision: Union[str, None] = '9a5e3c17d2b8'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # for per post scans of vote (score recounts), see the note on the
+    # model. Built concurrently so voting is not blocked while it builds
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_vote_post_id_user_id',
+            'vote',
+            ['post_id', 'user_id'],
+            unique=False,
+            postgresql_include=['vote_type'],
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            'ix_vote_post_id_user_id',
+            table_name='vote',
+            postgresql_concurrently=True,
+        )
@@ -0,0 +1,44 @@
+"""add post counter table
+
+Revision ID: c5d2e8f14a63
+Revises: a41e6d0c9b27
+Create Date: 2026-10-18 12:20:31.774102
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c5d2e8f14a63'
+down_revision: Union[str, None] = 'a41e6d0c9b27'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('post_counter',
+    sa.Column('key', sqlmodel.sql.sqltypes.AutoString(length=32), nullable=False),
+    sa.Column('count', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('key')
+    )
+
+    # backfill the counters from the existing live posts
+    op.execute(
+        """
+        INSERT INTO post_counter (key, count)
+        SELECT 'global', COUNT(*) FROM post WHERE deleted = false
+        UNION ALL
+        SELECT 'author:' || author_id, COUNT(*) FROM post
+        WHERE deleted = false GROUP BY author_id
+        """
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('post_counter')
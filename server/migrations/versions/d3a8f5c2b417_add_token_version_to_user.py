@@ -0,0 +1,28 @@
+"""add token version to user
+
+Revision ID: d3a8f5c2b417
+Revises: b62f0d8e4a19
+Create Date: 2026-10-18 20:03:51.447120
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd3a8f5c2b417'
+down_revision: Union[str, None] = 'b62f0d8e4a19'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('user', sa.Column('token_version', sa.Integer(), nullable=False, server_default='0'))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('user', 'token_version')
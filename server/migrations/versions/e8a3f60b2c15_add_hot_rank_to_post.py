@@ -0,0 +1,45 @@
+"""add hot rank to post
+
+Revision ID: e8a3f60b2c15
+Revises: c5d2e8f14a63
+Create Date: 2026-10-18 13:41:09.330547
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e8a3f60b2c15'
+down_revision: Union[str, None] = 'c5d2e8f14a63'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('post', sa.Column('hot_rank', sa.Float(), nullable=False, server_default='0'))
+
+    # backfill with the formula from src/services/ranking.py
+    op.execute(
+        """
+        UPDATE post
+        SET hot_rank = sign(score) * log(greatest(abs(score), 1)::float)
+            + (extract(epoch from created_at)::float - 1134028003) / 45000
+        """
+    )
+    op.create_index(
+        'ix_post_live_hot_rank_id',
+        'post',
+        ['hot_rank', 'id'],
+        unique=False,
+        postgresql_where=sa.text('deleted = false'),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_post_live_hot_rank_id', table_name='post')
+    op.drop_column('post', 'hot_rank')
@@ -0,0 +1,53 @@
+"""add post daily score leaderboard
+
+Revision ID: f17b4c9d3e82
+Revises: e8a3f60b2c15
+Create Date: 2026-10-18 15:02:56.118470
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f17b4c9d3e82'
+down_revision: Union[str, None] = 'e8a3f60b2c15'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('post_daily_score',
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('post_id', sa.Integer(), nullable=False),
+    sa.Column('score', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['post_id'], ['post.id'], ),
+    sa.PrimaryKeyConstraint('day', 'post_id')
+    )
+    op.create_index(
+        'ix_post_live_score_id',
+        'post',
+        ['score', 'id'],
+        unique=False,
+        postgresql_where=sa.text('deleted = false'),
+    )
+
+    # seed the buckets, same as `python -m src.manage rebuild-leaderboards`
+    op.execute(
+        """
+        INSERT INTO post_daily_score (day, post_id, score)
+        SELECT (created_at AT TIME ZONE 'UTC')::date, post_id, SUM(vote_type)
+        FROM vote
+        WHERE (created_at AT TIME ZONE 'UTC')::date >= (now() AT TIME ZONE 'UTC')::date - 29
+        GROUP BY 1, 2
+        """
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_post_live_score_id', table_name='post')
+    op.drop_table('post_daily_score')
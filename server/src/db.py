@@ -1,19 +1,132 @@
 from sqlmodel import SQLModel, create_engine
+from sqlmodel.ext.asyncio.session import AsyncSession
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 from src.models.post import Post
 from src.models.user import User
 from src.models.tag import Tag
 from src.models.vote import Vote
 from src.models.referral import ReferralCode, Referral
+from src.models.counter import PostCounter
+from src.models.leaderboard import PostDailyScore
+from src.models.score_shard import PostScoreShard
+from src.services.cache import TTLCache
+from src.services.pool_stats import PoolStats, timed_pool_class
 from dotenv import load_dotenv, find_dotenv
+from typing import Optional
 import os
 
 load_dotenv(find_dotenv())
 
 
 DATABASE_URL = os.getenv("DATABASE_URL")
-ECHO = os.getenv("ECHO", "false")
-engine = create_engine(DATABASE_URL, echo=ECHO)
+# the routes talk to postgres through asyncpg, the sync engine is kept for
+# alembic and the maintenance commands in src/manage.py
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL") or make_url(DATABASE_URL).set(
+    drivername="postgresql+asyncpg"
+)
+# "true" logs statements, "debug" also logs result rows
+ECHO = {"true": True, "debug": "debug"}.get(os.getenv("ECHO", "false").lower(), False)
 
+# every worker process has its own pool per engine, so the connections a
+# deployment can open are workers * (DB_POOL_SIZE + DB_MAX_OVERFLOW).
+# On asyncpg a pre-ping is BEGIN, an empty query and ROLLBACK, three round
+# trips on every checkout against one for psycopg2. Where nothing closes idle
+# connections before DB_POOL_RECYCLE it can be turned off.
+POOL_OPTIONS = {
+    "pool_size": int(os.getenv("DB_POOL_SIZE", "5")),
+    "max_overflow": int(os.getenv("DB_MAX_OVERFLOW", "10")),
+    "pool_timeout": float(os.getenv("DB_POOL_TIMEOUT", "30")),
+    "pool_recycle": int(os.getenv("DB_POOL_RECYCLE", "1800")),
+    "pool_pre_ping": os.getenv("DB_POOL_PRE_PING", "true").lower() == "true",
+}
 
-def create_db_and_tables():
-    SQLModel.metadata.create_all(engine)
+engine = create_engine(DATABASE_URL, echo=ECHO, **POOL_OPTIONS)
+writer_pool_stats = PoolStats("writer")
+async_engine = create_async_engine(
+    ASYNC_DATABASE_URL,
+    echo=ECHO,
+    poolclass=timed_pool_class(writer_pool_stats),
+    **POOL_OPTIONS,
+)
+writer_pool_stats.attach(async_engine.sync_engine)
+
+# expire_on_commit is off so objects stay readable after commit without an
+# implicit (and in async code, illegal) lazy reload
+async_session = async_sessionmaker(
+    async_engine, class_=AsyncSession, expire_on_commit=False
+)
+
+
+# optional read replica, used by the routes that only read through
+# read_session(). Pointing it at the primary runs both roles on one instance.
+READ_DATABASE_URL = os.getenv("READ_DATABASE_URL")
+ASYNC_READ_DATABASE_URL = os.getenv("ASYNC_READ_DATABASE_URL") or (
+    make_url(READ_DATABASE_URL).set(drivername="postgresql+asyncpg")
+    if READ_DATABASE_URL
+    else None
+)
+READ_STICKY_SECONDS = float(os.getenv("READ_STICKY_SECONDS", "5"))
+
+if ASYNC_READ_DATABASE_URL:
+    # reads that end up writing fail loudly instead of going unnoticed when
+    # the reader is the primary itself
+    reader_pool_stats = PoolStats("reader")
+    async_read_engine = create_async_engine(
+        ASYNC_READ_DATABASE_URL,
+        echo=ECHO,
+        connect_args={"server_settings": {"default_transaction_read_only": "on"}},
+        poolclass=timed_pool_class(reader_pool_stats),
+        **POOL_OPTIONS,
+    )
+    reader_pool_stats.attach(async_read_engine.sync_engine)
+else:
+    reader_pool_stats = None
+    async_read_engine = async_engine
+async_read_session = async_sessionmaker(
+    async_read_engine, class_=AsyncSession, expire_on_commit=False
+)
+
+# users that wrote in the last READ_STICKY_SECONDS read from the primary, so
+# replica lag never hides their own writes from them. Tracked per worker.
+recent_writers = TTLCache(maxsize=10000, ttl=READ_STICKY_SECONDS)
+
+
+def mark_write(user_id: int) -> None:
+    """Record that a user just wrote, call it after the commit"""
+    recent_writers.set(user_id, True)
+
+
+def read_session(user_id: Optional[int] = None) -> AsyncSession:
+    """
+    Session for read-only work. Goes to the read replica unless the user
+    wrote recently, then it is a primary session like async_session().
+    """
+    if user_id is not None and recent_writers.get(user_id):
+        return async_session()
+    return async_read_session()
+
+
+async def get_async_session():
+    async with async_session() as session:
+        yield session
+
+
+async def create_db_and_tables():
+    async with async_engine.begin() as conn:
+        await conn.run_sync(SQLModel.metadata.create_all)
+
+
+async def close_db() -> None:
+    """Close the pooled connections, they belong to the current event loop"""
+    await async_engine.dispose()
+    if async_read_engine is not async_engine:
+        await async_read_engine.dispose()
+
+
+def pool_stats() -> dict:
+    """Connection pool statistics of the engines serving requests"""
+    stats = {"writer": writer_pool_stats.stats()}
+    if reader_pool_stats is not None:
+        stats["reader"] = reader_pool_stats.stats()
+    return stats
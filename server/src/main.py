@@ -1,26 +1,43 @@
 import os
 from contextlib import asynccontextmanager
 from fastapi import FastAPI
+from fastapi.responses import ORJSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 
-from src.db import create_db_and_tables
+from src.db import create_db_and_tables, close_db
+from src.services.vote_buffer import vote_buffer
+from src.services.score_shards import shard_compactor
+from src.services.http_client import http_client
+from src.services.waitlist import waitlist_index
 from src.routes.posts import router as posts_router
 from src.routes.votes import router as votes_router
 from src.routes.auth import router as auth_router
 from src.routes.users import router as users_router
 from src.routes.test import router as test_router
 from src.routes.referral import router as referral_router
+from src.routes.metrics import router as metrics_router, METRICS_ENABLED
+from src.routes.stream import router as stream_router
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     print("Application is starting up.")
-    create_db_and_tables()
+    await create_db_and_tables()
+    http_client.start()
+    await waitlist_index.start()
+    vote_buffer.start()
+    shard_compactor.start()
     yield
     print("Application is shutting down.")
+    # write buffered votes before the worker exits
+    await vote_buffer.stop()
+    await shard_compactor.stop()
+    await waitlist_index.stop()
+    await http_client.stop()
+    await close_db()
 
 
-app = FastAPI(lifespan=lifespan)
+app = FastAPI(lifespan=lifespan, default_response_class=ORJSONResponse)
 
 FRONTEND_URL = os.getenv("FRONTEND_URL", "http://localhost:3000")
 origins = [FRONTEND_URL]
@@ -40,6 +57,9 @@ app.include_router(auth_router, prefix="/auth", tags=["auth"])
 app.include_router(users_router, prefix="/users", tags=["users"])
 app.include_router(test_router, prefix="/test", tags=["test"])
 app.include_router(referral_router, prefix="/referral", tags=["referral"])
+if METRICS_ENABLED:
+    app.include_router(metrics_router, prefix="/metrics", tags=["metrics"])
+app.include_router(stream_router, prefix="/stream", tags=["stream"])
 
 
 @app.get("/")
@@ -0,0 +1,66 @@
+"""
+Maintenance commands, run from the server directory:
+
+    python -m src.manage rebuild-leaderboards
+    python -m src.manage prune-leaderboards
+    python -m src.manage compact-scores
+    python -m src.manage partition-votes --partitions 16
+    python -m src.manage revoke-tokens <username>
+"""
+import argparse
+from sqlmodel import Session
+from src.db import engine
+from src.services.leaderboard import rebuild_leaderboards, prune_leaderboards
+from src.services.score_shards import compact_score_shards
+from src.services.votes import partition_vote_table
+from src.services.auth import revoke_user_tokens
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m src.manage")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparsers.add_parser(
+        "rebuild-leaderboards", help="rebuild the top post leaderboards from votes"
+    )
+    subparsers.add_parser(
+        "prune-leaderboards", help="drop leaderboard buckets no window needs"
+    )
+    subparsers.add_parser(
+        "compact-scores", help="fold the sharded vote counters into the posts"
+    )
+    partition_parser = subparsers.add_parser(
+        "partition-votes",
+        help="rebuild the vote table hash partitioned on post_id, locks it meanwhile",
+    )
+    partition_parser.add_argument("--partitions", type=int, default=16)
+    revoke_parser = subparsers.add_parser(
+        "revoke-tokens", help="log a user out everywhere, e.g. when banning them"
+    )
+    revoke_parser.add_argument("username")
+    args = parser.parse_args()
+
+    with Session(engine) as session:
+        if args.command == "rebuild-leaderboards":
+            count = rebuild_leaderboards(session)
+            print(f"Leaderboards rebuilt, {count} daily buckets written.")
+        elif args.command == "prune-leaderboards":
+            count = prune_leaderboards(session)
+            print(f"Leaderboards pruned, {count} daily buckets dropped.")
+        elif args.command == "compact-scores":
+            count = compact_score_shards(session)
+            print(f"Score shards compacted into {count} posts.")
+        elif args.command == "partition-votes":
+            count = partition_vote_table(session, args.partitions)
+            print(
+                f"Vote table split into {args.partitions} partitions, "
+                f"{count} votes copied."
+            )
+        elif args.command == "revoke-tokens":
+            if revoke_user_tokens(session, args.username):
+                print(f"Tokens of {args.username} revoked.")
+            else:
+                print(f"User {args.username} not found.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,9 @@
+from sqlmodel import SQLModel, Field
+
+
+class PostCounter(SQLModel, table=True):
+    __tablename__ = "post_counter"
+
+    # "global" for all live posts, "author:<user id>" for a single author
+    key: str = Field(primary_key=True, max_length=32)
+    count: int = Field(default=0)
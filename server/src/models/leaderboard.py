@@ -0,0 +1,12 @@
+from sqlmodel import SQLModel, Field
+from datetime import date
+
+
+class PostDailyScore(SQLModel, table=True):
+    __tablename__ = "post_daily_score"
+
+    # net score of the votes cast on a post on a given (UTC) day, the
+    # primary key starts with day so window scans are a range read
+    day: date = Field(primary_key=True)
+    post_id: int = Field(primary_key=True, foreign_key="post.id")
+    score: int = Field(default=0)
@@ -2,9 +2,15 @@ from typing import Optional
 from sqlmodel import SQLModel, Field
 from datetime import datetime
 import sqlalchemy as sa
+from sqlalchemy.dialects.postgresql import TSVECTOR
 from pydantic import Field as PydanticField
 
 
+# post.id is a serial (int4). asyncpg refuses to bind a larger id instead of
+# matching nothing, so the routes reject ids outside 1..MAX_POST_ID up front
+MAX_POST_ID = 2**31 - 1
+
+
 class PostBase(SQLModel):
     content: str = PydanticField(..., min_length=1, max_length=420)
 
@@ -19,6 +25,68 @@ class Post(PostBase, table=True):
         nullable=False,
     )
     deleted: bool = Field(default=False, nullable=False)
+    # denormalized vote counters, kept in sync by src/services/votes.py
+    score: int = Field(default=0, sa_column_kwargs={"server_default": "0"})
+    upvotes: int = Field(default=0, sa_column_kwargs={"server_default": "0"})
+    downvotes: int = Field(default=0, sa_column_kwargs={"server_default": "0"})
+    # see src/services/ranking.py, only changes when the score does
+    hot_rank: float = Field(default=0, sa_column_kwargs={"server_default": "0"})
+
+    __table_args__ = (
+        # keyset pagination index for the feed, only covers live posts
+        sa.Index(
+            "ix_post_live_created_at_id",
+            "created_at",
+            "id",
+            postgresql_where=sa.text("deleted = false"),
+        ),
+        # profile listings, see GET /posts/user/{username}
+        sa.Index(
+            "ix_post_live_author_created_at_id",
+            "author_id",
+            "created_at",
+            "id",
+            postgresql_where=sa.text("deleted = false"),
+        ),
+        sa.Index(
+            "ix_post_live_score_id",
+            "score",
+            "id",
+            postgresql_where=sa.text("deleted = false"),
+        ),
+        sa.Index(
+            "ix_post_live_hot_rank_id",
+            "hot_rank",
+            "id",
+            postgresql_where=sa.text("deleted = false"),
+        ),
+        # full text search, see src/services/search.py. the vector is stored
+        # so ranking does not re-parse the content of every match
+        sa.Column(
+            "search_vector",
+            TSVECTOR,
+            sa.Computed("to_tsvector('english', content)", persisted=True),
+        ),
+        sa.Index(
+            "ix_post_search_vector",
+            "search_vector",
+            postgresql_using="gin",
+            postgresql_where=sa.text("deleted = false"),
+        ),
+    )
+    # only search reads the vector, keep it out of select(Post)
+    __mapper_args__ = {"exclude_properties": ["search_vector"]}
+
+
+# search ranks the newest matches of a term, found by walking post_pkey for a
+# common term and through ix_post_search_vector for a rare one. With the
+# default statistics target every word past the most common few hundred is
+# estimated far too common, and rare words were walked through post_pkey too
+sa.event.listen(
+    Post.__table__,
+    "after_create",
+    sa.DDL("ALTER TABLE post ALTER COLUMN search_vector SET STATISTICS 1000"),
+)
 
 
 class PostCreate(PostBase):
@@ -0,0 +1,16 @@
+from sqlmodel import SQLModel, Field
+from datetime import date
+
+
+class PostScoreShard(SQLModel, table=True):
+    __tablename__ = "post_score_shard"
+
+    # vote deltas not yet folded into the post counters and the daily
+    # leaderboard buckets, spread over several rows per post so concurrent
+    # voters on one post do not queue behind a single row lock
+    post_id: int = Field(primary_key=True, foreign_key="post.id")
+    day: date = Field(primary_key=True)
+    shard: int = Field(primary_key=True)
+    score: int = Field(default=0)
+    upvotes: int = Field(default=0)
+    downvotes: int = Field(default=0)
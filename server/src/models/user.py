@@ -5,6 +5,7 @@ from pydantic import EmailStr, field_validator
 import re
 from sqlalchemy import LargeBinary, String, Column, Text
 from sqlalchemy.dialects.postgresql import ARRAY as PG_ARRAY
+from sqlalchemy.orm import declared_attr, deferred
 
 
 class UserBase(SQLModel):
@@ -28,12 +29,29 @@ class User(UserBase, table=True):
     referred_by: Optional[int] = Field(default=None, foreign_key="user.id")
     referral_count: int = Field(default=0)
     avatar_seed: Optional[str] = Field(default=None, nullable=True)
+    # bumped to revoke every token issued so far, tokens carry it as "ver"
+    token_version: int = Field(default=0, sa_column_kwargs={"server_default": "0"})
     # NOTE: The `tags` property is just an array of strings, however it should have been an array of
     # foreign keys "tag.key"
     # As of 12/3/25, it's not supported in SQLAlchemy / SQLModel, hence it's just an array of strings
     # As a result of this, we have to implement referential integrity manually.
     # Similarly, we have to implement backpopulate manually for this.
 
+    @declared_attr
+    def __mapper_args__(cls):
+        # only the auth flow needs these, so they are left out of every User
+        # load unless asked for with undefer()
+        return {
+            "properties": {
+                name: deferred(cls.__table__.c[name])
+                for name in (
+                    "encrypted_refresh_token",
+                    "verification_token",
+                    "verification_token_expires",
+                )
+            }
+        }
+
 
 # class UserCreate(SQLModel):
 #     username: str
@@ -1,25 +1,31 @@
 import jwt
-from sqlmodel import Session, select
-from src.db import engine
-from fastapi import APIRouter, Response, status, HTTPException, Request
+from sqlmodel import select
+from src.db import async_session, mark_write
+from fastapi import APIRouter, Cookie, Response, status, HTTPException, Request
 from src.models.user import User
 from fastapi.responses import RedirectResponse
 import httpx
 import os
 from dotenv import load_dotenv, find_dotenv
 from datetime import datetime, timezone, timedelta
+from typing import Annotated
 from fastapi.responses import HTMLResponse
 
 # from src.services.email import load_email_template
 # from src.services.auth import hash_email
-from src.services.auth import encrypt_refresh_token
+from src.services.auth import (
+    encrypt_refresh_token,
+    invalidate_principal,
+    decode_access_token,
+    revoke_tokens,
+)
 from src.services.tags import assign_user_tags
-from google.oauth2 import id_token
-from google.auth.transport import requests as google_requests
+from src.services.http_client import http_client
+from src.services.google_certs import google_certs, GOOGLE_TOKEN_URL
+from src.services.waitlist import waitlist_index
 
 import hmac
 import hashlib
-from supabase import create_client, Client
 
 load_dotenv(find_dotenv())
 
@@ -28,8 +34,6 @@ GOOGLE_CLIENT_SECRET = os.getenv("GOOGLE_CLIENT_SECRET")
 GOOGLE_REDIRECT_URI = os.getenv("GOOGLE_REDIRECT_URI")
 JWT_SECRET_KEY = os.getenv("JWT_SECRET_KEY")
 
-SUPABASE_URL = os.getenv("SUPABASE_URL")
-SUPABASE_SERVICE_ROLE_KEY = os.getenv("SUPABASE_SERVICE_ROLE_KEY")
 IDENTIFIER_HASH_SECRET = os.getenv("IDENTIFIER_HASH_SECRET")
 
 if not all(
@@ -37,12 +41,11 @@ if not all(
 ):
     raise ValueError("Missing required Google OAuth or JWT environment variables.")
 
-if not all([SUPABASE_URL, SUPABASE_SERVICE_ROLE_KEY, IDENTIFIER_HASH_SECRET]):
+if not IDENTIFIER_HASH_SECRET:
     raise ValueError(
-        "Missing Supabase or Identifier Hash environment variables for waitlist check."
+        "Missing Identifier Hash environment variable for waitlist check."
     )
 
-supabase: Client = create_client(SUPABASE_URL, SUPABASE_SERVICE_ROLE_KEY)
 router = APIRouter()
 
 
@@ -96,7 +99,6 @@ async def google_callback(
         referral_code = state.replace("referral_", "")
         print(f"Referral signup detected with code: {referral_code}")
 
-    token_url = "https://oauth2.googleapis.com/token"
     token_data = {
         "code": code,
         "client_id": GOOGLE_CLIENT_ID,
@@ -104,25 +106,24 @@ async def google_callback(
         "redirect_uri": GOOGLE_REDIRECT_URI,
         "grant_type": "authorization_code",
     }
-    async with httpx.AsyncClient() as client:
-        try:
-            token_response = await client.post(token_url, data=token_data)
-            token_response.raise_for_status()
-            token_json = token_response.json()
-        except httpx.HTTPStatusError as e:
-            print(
-                f"HTTP error exchanging code: {e.response.status_code} - {e.response.text}"
-            )
-            raise HTTPException(
-                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                detail="Failed to exchange authorization code with Google.",
-            )
-        except Exception as e:
-            print(f"Error exchanging code: {e}")
-            raise HTTPException(
-                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                detail="An error occurred during token exchange.",
-            )
+    try:
+        token_response = await http_client.post(GOOGLE_TOKEN_URL, data=token_data)
+        token_response.raise_for_status()
+        token_json = token_response.json()
+    except httpx.HTTPStatusError as e:
+        print(
+            f"HTTP error exchanging code: {e.response.status_code} - {e.response.text}"
+        )
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to exchange authorization code with Google.",
+        )
+    except Exception as e:
+        print(f"Error exchanging code: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="An error occurred during token exchange.",
+        )
 
     access_token = token_json.get("access_token")
     refresh_token = token_json.get("refresh_token")
@@ -135,9 +136,7 @@ async def google_callback(
         )
 
     try:
-        id_info = id_token.verify_oauth2_token(
-            id_token_jwt, google_requests.Request(), GOOGLE_CLIENT_ID
-        )
+        id_info = await google_certs.verify_id_token(id_token_jwt, GOOGLE_CLIENT_ID)
 
         google_id = id_info.get("sub")
         email = id_info.get("email")
@@ -163,16 +162,18 @@ async def google_callback(
 
 
     user = None
-    with Session(engine) as session:
-        user = session.exec(select(User).where(User.google_id == google_id)).first()
+    async with async_session() as session:
+        user = (
+            await session.exec(select(User).where(User.google_id == google_id))
+        ).first()
 
     if user:
-        with Session(engine) as session:
+        async with async_session() as session:
             if refresh_token:
                 user.encrypted_refresh_token = encrypt_refresh_token(refresh_token)
                 session.add(user)
-                session.commit()
-                session.refresh(user)
+                await session.commit()
+                await session.refresh(user)
             print(f"Existing user logged in: {user.id}")
     else:
         
@@ -188,28 +189,19 @@ async def google_callback(
 
         try:
             hashed_google_id = hash_identifier(google_id)
-            waitlist_query = (
-                supabase.table("waitlist_users")
-                .select("hashed_google_id")
-                .eq("hashed_google_id", hashed_google_id)
-                .execute()
-            )
-
-            if waitlist_query.data:
+            if await waitlist_index.contains(hashed_google_id):
                 allowed_to_signup = True
                 signup_source = "waitlist"
-                print(
-                    f"User {hashed_google_id} found in Supabase waitlist access allowed."
-                )
+                print(f"User {hashed_google_id} found in waitlist access allowed.")
         except Exception as e:
-            print(f"Error checking Supabase waitlist: {e}")
+            print(f"Error checking waitlist: {e}")
 
         if not allowed_to_signup:
             if referral_code:
-                with Session(engine) as session:
+                async with async_session() as session:
                     from src.services.referral import validate_referral_code
 
-                    is_valid, referral_code_obj, referrer = validate_referral_code(
+                    is_valid, referral_code_obj, referrer = await validate_referral_code(
                         session, referral_code
                     )
 
@@ -234,7 +226,7 @@ async def google_callback(
                 detail="Only waitlisted users or referred users can access Anon. Please ask your friend for a referral.",
             )
 
-        with Session(engine) as session:
+        async with async_session() as session:
             encrypted_rt = (
                 encrypt_refresh_token(refresh_token) if refresh_token else None
             )
@@ -246,8 +238,8 @@ async def google_callback(
                 referred_by=referrer_id,
             )
             session.add(new_user)
-            session.commit()
-            session.refresh(new_user)
+            await session.commit()
+            await session.refresh(new_user)
             user = new_user
             print(f"New user created: {user.id}")
 
@@ -256,26 +248,32 @@ async def google_callback(
             if user_tags:
                 user.tags = user_tags
                 session.add(user)
-                session.commit()
-                session.refresh(user)
+                await session.commit()
+                await session.refresh(user)
                 print(f"Tags assigned to user {user.id}: {user_tags}")
 
             if referrer_id and signup_source == "referral":
                 from src.services.referral import complete_referral_simple
 
-                success = complete_referral_simple(
+                success = await complete_referral_simple(
                     session, referrer_id, user.id, referral_code
                 )
                 if success:
                     print(f"Referral completed: {referrer_id} -> {user.id}")
+                    invalidate_principal(referrer_id)
 
     if not user or user.id is None:
         raise HTTPException(
             status_code=500, detail="Failed to retrieve user data after login/signup."
         )
+    # the next requests read this user back, keep them on the primary and
+    # drop whatever this worker cached for them
+    mark_write(user.id)
+    invalidate_principal(user.id)
 
     jwt_payload = {
         "sub": str(user.id),
+        "ver": user.token_version,
         "iat": datetime.now(timezone.utc),
         "exp": datetime.now(timezone.utc) + timedelta(days=7),
     }
@@ -303,10 +301,21 @@ async def google_callback(
 
 
 @router.post("/logout", status_code=status.HTTP_200_OK, tags=["auth"])
-async def logout(response: Response):
+async def logout(
+    response: Response, access_token: Annotated[str | None, Cookie()] = None
+):
     """
-    Logout user by clearing the access token cookie.
+    Logout user by clearing the access token cookie and revoking the tokens
+    issued to them, so a copied cookie stops working as well.
     """
+    try:
+        user_id, _ = decode_access_token(access_token)
+    except HTTPException:
+        user_id = None
+    if user_id is not None:
+        async with async_session() as session:
+            await revoke_tokens(session, user_id)
+
     print("logout requested, clearing the access token cookie.")
     frontend_redirect_base = os.getenv("FRONTEND_URL", "http://localhost:3000")
     response.delete_cookie(
@@ -0,0 +1,38 @@
+import os
+from dotenv import load_dotenv, find_dotenv
+from fastapi import APIRouter
+from src.db import pool_stats
+from src.services.feed_cache import feed_cache
+from src.services.auth import principal_cache
+from src.services.events import broker
+from src.services.vote_buffer import vote_buffer
+from src.services.score_shards import shard_compactor
+from src.services.http_client import http_client
+from src.services.google_certs import google_certs
+from src.services.waitlist import waitlist_index
+
+load_dotenv(find_dotenv())
+
+# the numbers describe the worker's internals, the route is only mounted
+# when this is set, on deployments where /metrics is not public
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "false").lower() == "true"
+
+router = APIRouter()
+
+
+@router.get("/", include_in_schema=False)
+def get_metrics():
+    """
+    In-process statistics for this worker
+    """
+    return {
+        "feed_cache": feed_cache.stats(),
+        "principal_cache": principal_cache.stats(),
+        "events": broker.stats(),
+        "vote_buffer": vote_buffer.stats(),
+        "score_shards": shard_compactor.stats(),
+        "db_pool": pool_stats(),
+        "http_client": http_client.stats(),
+        "google_certs": google_certs.stats(),
+        "waitlist": waitlist_index.stats(),
+    }
@@ -1,12 +1,39 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy import desc, func, case
-from src.models.post import PostPublic, PostCreate, Post, Author
+from fastapi import APIRouter, Depends, HTTPException, Path, Query, Request
+from sqlalchemy import desc, func, tuple_
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.orm import Bundle
+from src.models.post import PostPublic, PostCreate, Post, Author, MAX_POST_ID
 from src.models.user import User
 from src.models.vote import Vote
-from src.services.auth import get_current_user
-from src.db import engine
-from sqlmodel import Session, select
-from typing import List, Generic, TypeVar
+from src.services.auth import get_current_user, get_current_user_id
+from src.services.pagination import (
+    encode_cursor,
+    decode_cursor,
+    encode_rank_cursor,
+    decode_rank_cursor,
+)
+from src.services.ranking import hot_rank
+from src.services.score_shards import score_expression
+from src.services.leaderboard import window_scores
+from src.services.search import (
+    QUERY_CANCELED,
+    SEARCH_MAX_CANDIDATES,
+    search_query,
+    search_timeout,
+    search_vector,
+)
+from src.services.counts import adjust_post_counts, get_post_count
+from src.services.feed_cache import FeedPage, feed_cache, invalidate_feed
+from src.services.votes import get_user_votes
+from src.services.vote_buffer import vote_buffer
+from src.services.events import publish_new_post, publish_post_deleted
+from src.services.etag import make_etag, post_validator, etag_matches, not_modified
+from src.services.responses import fast_response
+from src.db import async_session, read_session, mark_write
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from typing import Annotated, List, Generic, Literal, Optional, Tuple, TypeVar
+from datetime import datetime, timezone
 from pydantic import BaseModel
 
 T = TypeVar("T")
@@ -14,184 +41,559 @@ T = TypeVar("T")
 
 class PaginatedResponse(BaseModel, Generic[T]):
     items: List[T]
-    total: int
+    total: Optional[int]
     limit: int
     offset: int
+    next_cursor: Optional[str] = None
 
 
+class BatchPostsResponse(BaseModel):
+    items: List[PostPublic]
+    missing: List[int]  # ids that do not exist or were deleted
+
+
+MAX_BATCH_IDS = 50
+
 router = APIRouter()
 
 
-def create_post_public_with_votes(
-    session: Session, post: Post, author: User, current_user_id: int
-) -> PostPublic:
-    """create PostPublic with vote data"""
-    score = (
-        session.exec(
-            select(func.coalesce(func.sum(Vote.vote_type), 0)).where(
-                Vote.post_id == post.id
-            )
-        ).first()
-        or 0
+def select_posts():
+    """
+    Base statement for the viewer independent part of PostPublic rows.
+    Only the author columns PostPublic shows are selected, not the whole User.
+    """
+    author = Bundle("author", User.id, User.username, User.avatar_seed)
+    return select(Post, author, score_expression().label("score")).join(
+        User, Post.author_id == User.id
     )
 
-    user_vote = session.exec(
-        select(Vote.vote_type)
-        .where(Vote.post_id == post.id)
-        .where(Vote.user_id == current_user_id)
-    ).first()
 
-    return PostPublic(
-        **post.model_dump(),
-        author=Author(author_id=author.id, username=author.username, avatar_seed=author.avatar_seed),
+def select_posts_public(current_user_id: int):
+    """
+    Base statement for building PostPublic rows: post, author and the current
+    user's vote in a single round trip. Callers add their own filters.
+    """
+    return (
+        select_posts()
+        .add_columns(Vote.vote_type)
+        .outerjoin(
+            Vote, (Post.id == Vote.post_id) & (Vote.user_id == current_user_id)
+        )
+    )
+
+
+def with_pending_votes(rows, viewer_id: int):
+    """
+    Rows of select_posts_public with the viewer's votes that still sit in the
+    vote buffer, so nobody waits for a flush to see their own vote
+    """
+    if not vote_buffer.enabled:
+        return rows
+    return [
+        (post, author, score, vote_buffer.viewer_vote(viewer_id, post.id, user_vote))
+        for post, author, score, user_vote in rows
+    ]
+
+
+def create_post_public(
+    post: Post, author, score: int, user_vote: Optional[int] = None
+) -> PostPublic:
+    """
+    create PostPublic from a row of select_posts_public. The row comes straight
+    from the database, so the models are constructed without validation.
+    """
+    return PostPublic.model_construct(
+        id=post.id,
+        content=post.content,
+        created_at=post.created_at,
+        author=Author.model_construct(
+            author_id=author.id, username=author.username, avatar_seed=author.avatar_seed
+        ),
         score=score,
-        user_vote=user_vote
+        user_vote=user_vote,
+    )
+
+
+def feed_page(
+    statement, limit: int, offset: int, position: Optional[Tuple[datetime, int]]
+):
+    """
+    Restrict a post statement to one page of the global feed, starting right
+    after position when there is one and at offset otherwise
+    """
+    statement = (
+        statement.where(Post.deleted == False)
+        .order_by(desc(Post.created_at), desc(Post.id))
+        .limit(limit)
+    )
+    if position is not None:
+        return statement.where(tuple_(Post.created_at, Post.id) < tuple_(*position))
+    return statement.offset(offset)
+
+
+def author_page(statement, author_id: int, limit: int, offset: int):
+    """Restrict a post statement to one page of an author's live posts"""
+    return (
+        statement.where(Post.author_id == author_id)
+        .where(Post.deleted == False)
+        .order_by(desc(Post.created_at), desc(Post.id))
+        .offset(offset)
+        .limit(limit)
+    )
+
+
+def search_page(
+    statement, q: str, limit: int, offset: int, candidates: int = SEARCH_MAX_CANDIDATES
+):
+    """
+    Restrict a post statement to one page of live posts matching q, best
+    first. Only the newest candidates matches are ranked, so a common word
+    costs at most that many rankings.
+    """
+    query = search_query(q)
+    matches = Post.__table__.alias("matches")
+    newest_matches = (
+        select(matches.c.id)
+        .where(matches.c.deleted == False)
+        .where(search_vector(matches).op("@@")(query))
+        .order_by(desc(matches.c.id))
+        .limit(candidates)
+    )
+    return (
+        statement.where(Post.id.in_(newest_matches))
+        .order_by(desc(func.ts_rank_cd(search_vector(), query)), desc(Post.id))
+        .offset(offset)
+        .limit(limit)
     )
 
 
+async def build_feed_page(
+    session: AsyncSession,
+    limit: int,
+    offset: int,
+    position: Optional[Tuple[datetime, int]],
+    count: str,
+) -> FeedPage:
+    """Build the viewer independent part of a global feed page"""
+    total_count = await get_post_count(session, mode=count)
+
+    results = (
+        await session.exec(feed_page(select_posts(), limit, offset, position))
+    ).all()
+
+    items = [create_post_public(*row) for row in results]
+    next_cursor = None
+    if len(items) == limit:
+        next_cursor = encode_cursor(items[-1].created_at, items[-1].id)
+    return FeedPage(items=items, total=total_count, next_cursor=next_cursor)
+
+
 @router.post("/", response_model=PostPublic)
-def post_posts(post: PostCreate, user: User = Depends(get_current_user)):
+async def post_posts(post: PostCreate, user: User = Depends(get_current_user)):
     """
     Create a new post with the current user as the author
     """
-    with Session(engine) as session:
-        post_create = Post(**post.model_dump(), author_id=user.id)
+    async with async_session() as session:
+        post_create = Post(
+            **post.model_dump(),
+            author_id=user.id,
+            hot_rank=hot_rank(0, datetime.now(timezone.utc)),
+        )
         db_post = Post.model_validate(post_create)
         session.add(db_post)
-        session.commit()
-        session.refresh(db_post)
-        author = session.exec(select(User).where(User.id == db_post.author_id)).first()
-        return create_post_public_with_votes(session, db_post, author, user.id)
+        await adjust_post_counts(session, user.id, 1)
+        await session.commit()
+        mark_write(user.id)
+        invalidate_feed()
+        row = (
+            await session.exec(
+                select_posts_public(user.id).where(Post.id == db_post.id)
+            )
+        ).one()
+        post_public = create_post_public(*row)
+        publish_new_post(post_public.model_dump(mode="json", exclude={"user_vote"}))
+        return post_public
 
 
 @router.get("/", response_model=PaginatedResponse[PostPublic])
-def get_posts(
-    user: User = Depends(get_current_user),
+async def get_posts(
+    request: Request,
+    viewer_id: int = Depends(get_current_user_id),
     limit: int = Query(default=10, ge=1, le=50),
     offset: int = Query(default=0, ge=0),
+    cursor: Optional[str] = Query(default=None),
+    count: Literal["exact", "estimated", "none"] = Query(default="exact"),
 ):
     """
-    Get paginated posts with their authors and vote data
+    Get paginated posts with their authors and vote data.
+    When a cursor is given, offset is ignored and the page starts right after
+    the post the cursor points to (keyset pagination on created_at, id).
+    count controls how total is filled: "estimated" may serve a slightly
+    stale value and "none" leaves it empty.
     """
-    with Session(engine) as session:
-        total_count = session.exec(
-            select(func.count()).select_from(Post).where(Post.deleted == False)
-        ).first()
+    position = None
+    if cursor is not None:
+        position = decode_cursor(cursor)
+        if position is None:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+
+    cache_key = (limit, offset if position is None else None, cursor, count)
+    page = feed_cache.get(cache_key)
+    if page is None and feed_cache.enabled:
+        # every viewer is served the cached page, including someone who just
+        # posted and is sticky to the primary, so it is never built from a
+        # replica that may not have their post yet
+        generation = feed_cache.generation
+        async with async_session() as session:
+            page = await build_feed_page(session, limit, offset, position, count)
+        # a post created or deleted during the build invalidated the feed,
+        # the page may predate it and is served to this viewer only
+        feed_cache.set(cache_key, page, generation=generation)
+
+    async with read_session(viewer_id) as session:
+        if page is None:
+            page = await build_feed_page(session, limit, offset, position, count)
+
+        post_ids = [item.id for item in page.items]
+        user_votes = vote_buffer.viewer_votes(
+            viewer_id, post_ids, await get_user_votes(session, viewer_id, post_ids)
+        )
+
+        etag = make_etag(
+            "feed",
+            cache_key,
+            [
+                (item.id, item.score, item.author.username, item.author.avatar_seed)
+                for item in page.items
+            ],
+            sorted(user_votes.items()),
+            page.total,
+            page.next_cursor,
+        )
+        if etag_matches(request, etag):
+            return not_modified(etag)
+
+        posts_public = [
+            item.model_copy(update={"user_vote": user_votes.get(item.id)})
+            for item in page.items
+        ]
+        return fast_response(
+            PaginatedResponse.model_construct(
+                items=posts_public,
+                total=page.total,
+                limit=limit,
+                offset=offset,
+                next_cursor=page.next_cursor,
+            ),
+            etag=etag,
+        )
+
+
+@router.get("/hot", response_model=PaginatedResponse[PostPublic])
+async def get_hot_posts(
+    viewer_id: int = Depends(get_current_user_id),
+    limit: int = Query(default=10, ge=1, le=50),
+    cursor: Optional[str] = Query(default=None),
+    count: Literal["exact", "estimated", "none"] = Query(default="exact"),
+):
+    """
+    Get posts ranked by score with time decay, newest and most upvoted first.
+    The rank is stored on the post and kept up to date by the vote routes,
+    pages are fetched with a keyset cursor over (hot_rank, id).
+    """
+    position = None
+    if cursor is not None:
+        position = decode_rank_cursor(cursor)
+        if position is None:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+
+    async with read_session(viewer_id) as session:
+        total_count = await get_post_count(session, mode=count)
 
         statement = (
-            select(
-                Post,
-                User,
-                func.coalesce(func.sum(Vote.vote_type), 0).label("score"),
-                func.max(
-                    case((Vote.user_id == user.id, Vote.vote_type), else_=None)
-                ).label("user_vote"),
-            )
-            .join(User, Post.author_id == User.id)
-            .outerjoin(Vote, Post.id == Vote.post_id)
+            select_posts_public(viewer_id)
             .where(Post.deleted == False)
-            .group_by(Post.id, User.id)
-            .order_by(desc(Post.created_at))
-            .offset(offset)
+            .order_by(desc(Post.hot_rank), desc(Post.id))
             .limit(limit)
         )
-        results = session.exec(statement).all()
+        if position is not None:
+            statement = statement.where(
+                tuple_(Post.hot_rank, Post.id) < tuple_(*position)
+            )
+        results = with_pending_votes((await session.exec(statement)).all(), viewer_id)
 
-        posts_public = [
-            PostPublic(
-                id=post.id,
-                content=post.content,
-                created_at=post.created_at,
-                author=Author(author_id=author.id, username=author.username, avatar_seed=author.avatar_seed),
-                score=score,
-                user_vote=user_vote,
+        posts_public = [create_post_public(*row) for row in results]
+        next_cursor = None
+        if len(results) == limit:
+            last_post = results[-1][0]
+            next_cursor = encode_rank_cursor(last_post.hot_rank, last_post.id)
+        return fast_response(
+            PaginatedResponse.model_construct(
+                items=posts_public,
+                total=total_count,
+                limit=limit,
+                offset=0,
+                next_cursor=next_cursor,
+            )
+        )
+
+
+@router.get("/top", response_model=PaginatedResponse[PostPublic])
+async def get_top_posts(
+    viewer_id: int = Depends(get_current_user_id),
+    window: Literal["day", "week", "month", "all"] = Query(default="day"),
+    limit: int = Query(default=10, ge=1, le=50),
+    offset: int = Query(default=0, ge=0),
+):
+    """
+    Get the highest scoring posts for a time window.
+    Windows other than "all" rank by the votes cast within the window, read
+    from the daily leaderboard buckets the vote routes maintain. total is
+    not filled for this listing.
+    """
+    async with read_session(viewer_id) as session:
+        statement = select_posts_public(viewer_id).where(Post.deleted == False)
+        if window == "all":
+            statement = statement.order_by(desc(Post.score), desc(Post.id))
+        else:
+            scores = window_scores(window)
+            statement = statement.join(scores, scores.c.post_id == Post.id).order_by(
+                desc(scores.c.window_score), desc(Post.id)
+            )
+        results = with_pending_votes(
+            (await session.exec(statement.offset(offset).limit(limit))).all(),
+            viewer_id,
+        )
+
+        posts_public = [create_post_public(*row) for row in results]
+        return fast_response(
+            PaginatedResponse.model_construct(
+                items=posts_public,
+                total=None,
+                limit=limit,
+                offset=offset,
+                next_cursor=None,
             )
-            for post, author, score, user_vote in results
-        ]
-        return PaginatedResponse(
-            items=posts_public,
-            total=total_count,
-            limit=limit,
-            offset=offset,
         )
 
 
+@router.get("/search", response_model=PaginatedResponse[PostPublic])
+async def search_posts(
+    q: str = Query(..., min_length=1, max_length=100),
+    viewer_id: int = Depends(get_current_user_id),
+    limit: int = Query(default=10, ge=1, le=50),
+    offset: int = Query(default=0, ge=0),
+):
+    """
+    Full text search over post content, best matches first, among the
+    newest matches. total is not filled for this listing.
+    """
+    async with read_session(viewer_id) as session:
+        await session.exec(search_timeout())
+        try:
+            results = (
+                await session.exec(
+                    search_page(select_posts_public(viewer_id), q, limit, offset)
+                )
+            ).all()
+        except DBAPIError as e:
+            if getattr(e.orig, "sqlstate", None) != QUERY_CANCELED:
+                raise
+            raise HTTPException(
+                status_code=503, detail="Search took too long, try a narrower query"
+            )
+        results = with_pending_votes(results, viewer_id)
+
+        posts_public = [create_post_public(*row) for row in results]
+        return fast_response(
+            PaginatedResponse.model_construct(
+                items=posts_public,
+                total=None,
+                limit=limit,
+                offset=offset,
+                next_cursor=None,
+            )
+        )
+
+
+@router.get("/batch", response_model=BatchPostsResponse)
+async def get_posts_batch(
+    ids: str = Query(..., description="Comma separated post ids"),
+    viewer_id: int = Depends(get_current_user_id),
+):
+    """
+    Get several posts by their IDs in one request.
+    Posts come back in the requested order, ids that do not exist or were
+    deleted are listed in missing instead of failing the request.
+    """
+    try:
+        post_ids = [int(post_id) for post_id in ids.split(",") if post_id.strip()]
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid post ids")
+    post_ids = list(dict.fromkeys(post_ids))
+    if not post_ids:
+        raise HTTPException(status_code=400, detail="No post ids given")
+    if len(post_ids) > MAX_BATCH_IDS:
+        raise HTTPException(
+            status_code=400, detail=f"At most {MAX_BATCH_IDS} post ids allowed"
+        )
+
+    # ids past int4 can not exist and asyncpg would refuse to bind them,
+    # they are reported as missing like any other unknown id
+    lookup_ids = [post_id for post_id in post_ids if 1 <= post_id <= MAX_POST_ID]
+    async with read_session(viewer_id) as session:
+        results = (
+            await session.exec(
+                select_posts_public(viewer_id)
+                .where(Post.id.in_(lookup_ids))
+                .where(Post.deleted == False)
+            )
+        ).all()
+    results = with_pending_votes(results, viewer_id)
+
+    posts_by_id = {row[0].id: create_post_public(*row) for row in results}
+    return fast_response(
+        BatchPostsResponse.model_construct(
+            items=[posts_by_id[post_id] for post_id in post_ids if post_id in posts_by_id],
+            missing=[post_id for post_id in post_ids if post_id not in posts_by_id],
+        )
+    )
+
+
 @router.get("/{post_id}", response_model=PostPublic)
-def get_post(post_id: int, user: User = Depends(get_current_user)):
+async def get_post(
+    post_id: Annotated[int, Path(ge=1, le=MAX_POST_ID)],
+    request: Request,
+    viewer_id: int = Depends(get_current_user_id),
+):
     """
     Get a post by its ID with its author and vote data
     """
-    with Session(engine) as session:
-        post = session.exec(
-            select(Post).where(Post.id == post_id).where(Post.deleted == False)
+    async with read_session(viewer_id) as session:
+        row = (
+            await session.exec(
+                select_posts_public(viewer_id)
+                .where(Post.id == post_id)
+                .where(Post.deleted == False)
+            )
         ).first()
-        if post is None:
+        if row is None:
             raise HTTPException(status_code=404, detail="Post not found")
-        author = session.exec(select(User).where(User.id == post.author_id)).first()
-        if author is None:
-            raise HTTPException(status_code=404, detail="Author not found")
-        return create_post_public_with_votes(session, post, author, user.id)
+        [row] = with_pending_votes([row], viewer_id)
+
+        etag = make_etag("post", post_validator(*row))
+        if etag_matches(request, etag):
+            return not_modified(etag)
+        return fast_response(create_post_public(*row), etag=etag)
 
 
 @router.delete("/{post_id}", response_model=PostPublic)
-def delete_post(post_id: int, user: User = Depends(get_current_user)):
+async def delete_post(
+    post_id: Annotated[int, Path(ge=1, le=MAX_POST_ID)],
+    user: User = Depends(get_current_user),
+):
     """
     Soft delete a post by its ID
     """
-    with Session(engine) as session:
-        post = session.exec(select(Post).where(Post.id == post_id)).first()
-        if post is None:
+    async with async_session() as session:
+        row = (
+            await session.exec(select_posts_public(user.id).where(Post.id == post_id))
+        ).first()
+        if row is None:
             raise HTTPException(status_code=404, detail="Post not found")
+        [(post, author, score, user_vote)] = with_pending_votes([row], user.id)
         if post.author_id != user.id:
             raise HTTPException(
                 status_code=403, detail="You are not the author of this post"
             )
-        post.deleted = True
-        session.add(post)
-        session.commit()
-        session.refresh(post)
-        author = session.exec(select(User).where(User.id == post.author_id)).first()
-        return create_post_public_with_votes(session, post, author, user.id)
+        if not post.deleted:
+            post.deleted = True
+            session.add(post)
+            await adjust_post_counts(session, post.author_id, -1)
+        post_public = create_post_public(post, author, score, user_vote)
+        await session.commit()
+        mark_write(user.id)
+        invalidate_feed()
+        publish_post_deleted(post_id)
+        return post_public
 
 
 @router.get("/user/{username}", response_model=PaginatedResponse[PostPublic])
-def get_posts_by_username(
+async def get_posts_by_username(
     username: str,
-    user: User = Depends(get_current_user),
+    request: Request,
+    viewer_id: int = Depends(get_current_user_id),
     limit: int = Query(default=10, ge=1, le=50),
     offset: int = Query(default=0, ge=0),
+    count: Literal["exact", "estimated", "none"] = Query(default="exact"),
 ):
     """
-    Get paginated posts by a specific username
+    Get paginated posts by a specific username.
+    A request with If-None-Match is first checked against the page's ids,
+    scores and votes, the posts are only loaded when it changed.
     """
-    with Session(engine) as session:
-        author = session.exec(select(User).where(User.username == username)).first()
+    async with read_session(viewer_id) as session:
+        author = (
+            await session.exec(
+                select(User.id, User.username, User.avatar_seed).where(
+                    User.username == username
+                )
+            )
+        ).first()
         if author is None:
             raise HTTPException(status_code=404, detail="User not found")
 
-        total_count = session.exec(
-            select(func.count())
-            .select_from(Post)
-            .where(Post.author_id == author.id)
-            .where(Post.deleted == False)
-        ).first()
+        total_count = await get_post_count(session, author_id=author.id, mode=count)
 
-        statement = (
-            select(Post)
-            .where(Post.author_id == author.id)
-            .where(Post.deleted == False)
-            .order_by(desc(Post.created_at))
-            .offset(offset)
-            .limit(limit)
-        )
-        posts = session.exec(statement).all()
-        posts_public = [
-            create_post_public_with_votes(session, post, author, user.id)
-            for post in posts
-        ]
-        return PaginatedResponse(
-            items=posts_public,
-            total=total_count,
-            limit=limit,
-            offset=offset,
+        if request.headers.get("if-none-match"):
+            # revalidating only needs the ids, scores and the viewer's votes,
+            # not the posts themselves
+            rows = (
+                await session.exec(
+                    author_page(
+                        select(Post.id, score_expression(), Vote.vote_type).outerjoin(
+                            Vote, (Post.id == Vote.post_id) & (Vote.user_id == viewer_id)
+                        ),
+                        author.id,
+                        limit,
+                        offset,
+                    )
+                )
+            ).all()
+            # the same fields as post_validator
+            validators = [
+                (
+                    post_id,
+                    score,
+                    author.username,
+                    author.avatar_seed,
+                    vote_buffer.viewer_vote(viewer_id, post_id, user_vote),
+                )
+                for post_id, score, user_vote in rows
+            ]
+            etag = make_etag(
+                "user_posts", author.id, limit, offset, total_count, validators
+            )
+            if etag_matches(request, etag):
+                return not_modified(etag)
+
+        results = (
+            await session.exec(
+                author_page(select_posts_public(viewer_id), author.id, limit, offset)
+            )
+        ).all()
+        results = with_pending_votes(results, viewer_id)
+        validators = [post_validator(*row) for row in results]
+        etag = make_etag("user_posts", author.id, limit, offset, total_count, validators)
+
+        posts_public = [create_post_public(*row) for row in results]
+        return fast_response(
+            PaginatedResponse.model_construct(
+                items=posts_public,
+                total=total_count,
+                limit=limit,
+                offset=offset,
+                next_cursor=None,
+            ),
+            etag=etag,
         )
@@ -1,6 +1,5 @@
 from fastapi import APIRouter, HTTPException, status, Depends, Request
-from sqlmodel import Session, select
-from src.db import engine
+from src.db import async_session, read_session, mark_write
 from src.models.user import User
 from src.models.referral import ReferralValidation, ReferralStats, ReferralCode
 from src.services.referral import (
@@ -8,7 +7,7 @@ from src.services.referral import (
     validate_referral_code,
     get_user_referral_stats,
 )
-from src.services.auth import get_current_user
+from src.services.auth import get_current_user, invalidate_principal
 import os
 
 router = APIRouter()
@@ -17,16 +16,18 @@ router = APIRouter()
 @router.get("/me", response_model=ReferralStats, tags=["referral"])
 async def get_user_referral_info(current_user: User = Depends(get_current_user)):
     """Get current user's referral code and statistics"""
-    with Session(engine) as session:
-        stats = get_user_referral_stats(session, current_user.id)
+    async with read_session(current_user.id) as session:
+        stats = await get_user_referral_stats(session, current_user.id)
         return ReferralStats(**stats)
 
 
 @router.post("/generate", response_model=ReferralStats, tags=["referral"])
 async def generate_user_referral_code(current_user: User = Depends(get_current_user)):
     """Generate a referral code for the current user"""
-    with Session(engine) as session:
-        referral_code = create_referral_code_for_user(session, current_user.id)
+    async with async_session() as session:
+        referral_code = await create_referral_code_for_user(session, current_user.id)
+        mark_write(current_user.id)
+        invalidate_principal(current_user.id)
 
         if not referral_code:
             raise HTTPException(
@@ -34,15 +35,15 @@ async def generate_user_referral_code(current_user: User = Depends(get_current_u
                 detail="Failed to generate referral code",
             )
 
-        stats = get_user_referral_stats(session, current_user.id)
+        stats = await get_user_referral_stats(session, current_user.id)
         return ReferralStats(**stats)
 
 
 @router.get("/validate/{code}", response_model=ReferralValidation, tags=["referral"])
 async def validate_referral_code_endpoint(code: str):
     """Validate a referral code"""
-    with Session(engine) as session:
-        is_valid, referral_code, user = validate_referral_code(session, code)
+    async with read_session() as session:
+        is_valid, referral_code, user = await validate_referral_code(session, code)
 
         if not is_valid or not referral_code or not user:
             return ReferralValidation(is_valid=False, code=code)
@@ -60,8 +61,8 @@ async def validate_referral_code_endpoint(code: str):
 @router.get("/{code}", tags=["referral"], include_in_schema=False)
 async def referral_landing_page(code: str):
     """Redirects to Google OAuth with referral code in state"""
-    with Session(engine) as session:
-        is_valid, referral_code, user = validate_referral_code(session, code)
+    async with read_session() as session:
+        is_valid, referral_code, user = await validate_referral_code(session, code)
 
         if not is_valid:
             raise HTTPException(
@@ -0,0 +1,42 @@
+import asyncio
+from fastapi import APIRouter, Depends, Request
+from fastapi.responses import StreamingResponse
+from src.models.user import User
+from src.services.auth import get_current_user
+from src.services.events import broker
+
+router = APIRouter()
+
+HEARTBEAT_SECONDS = 15
+
+
+@router.get("/")
+async def stream_events(request: Request, user: User = Depends(get_current_user)):
+    """
+    Server-Sent Events stream of new posts, deleted posts and score changes.
+    """
+    subscription = broker.subscribe()
+
+    async def event_stream():
+        try:
+            yield "retry: 5000\n\n"
+            while not subscription.overflowed:
+                try:
+                    message = await asyncio.wait_for(
+                        subscription.queue.get(), timeout=HEARTBEAT_SECONDS
+                    )
+                except asyncio.TimeoutError:
+                    if await request.is_disconnected():
+                        break
+                    # comment line, keeps proxies from closing idle streams
+                    yield ": heartbeat\n\n"
+                    continue
+                yield message
+        finally:
+            broker.unsubscribe(subscription)
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
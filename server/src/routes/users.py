@@ -1,9 +1,12 @@
-from fastapi import APIRouter, HTTPException, status, Depends
+from fastapi import APIRouter, HTTPException, status, Depends, Request, Response
 from src.models.user import UserPublic, User
-from src.db import engine
-from sqlmodel import Session, select
+from src.db import read_session, get_async_session, mark_write
+from sqlalchemy import update
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
 from typing import List
-from src.services.auth import get_current_user
+from src.services.auth import get_current_user, invalidate_principal
+from src.services.etag import make_etag, etag_matches, not_modified, set_etag
 from pydantic import BaseModel, Field
 import re
 
@@ -24,34 +27,50 @@ class SetAvatarRequest(BaseModel):
 
 
 @router.get("/", response_model=List[UserPublic], status_code=status.HTTP_200_OK)
-def get_users():
+async def get_users():
     """
     Get all users
     """
-    with Session(engine) as session:
-        users = session.exec(select(User)).all()
+    async with read_session() as session:
+        users = (await session.exec(select(User))).all()
         return users
 
 
 @router.get(
     "/user/{username}", response_model=UserPublic, status_code=status.HTTP_200_OK
 )
-def get_user(username: str):
+async def get_user(username: str, request: Request, response: Response):
     """
     Get a user by their username
     """
-    with Session(engine) as session:
-        user = session.exec(select(User).where(User.username == username)).first()
+    async with read_session() as session:
+        user = (
+            await session.exec(select(User).where(User.username == username))
+        ).first()
         if user is None:
             raise HTTPException(status_code=404, detail="User not found")
+
+        etag = make_etag(
+            "user",
+            user.id,
+            user.username,
+            user.bio,
+            user.tags,
+            user.referral_code,
+            user.referral_count,
+            user.avatar_seed,
+        )
+        if etag_matches(request, etag):
+            return not_modified(etag)
+        set_etag(response, etag)
         return user
 
 
 @router.patch("/me/username", response_model=UserPublic, status_code=status.HTTP_200_OK)
-def set_my_username(
+async def set_my_username(
     username_data: SetUsernameRequest,
     current_user: User = Depends(get_current_user),
-    session: Session = Depends(lambda: Session(engine)),
+    session: AsyncSession = Depends(get_async_session),
 ):
     """
     Sets the username for the currently authenticated user.
@@ -63,8 +82,10 @@ def set_my_username(
             detail="Username has already been set for this account.",
         )
 
-    existing_user = session.exec(
-        select(User).where(User.username == username_data.username)
+    existing_user = (
+        await session.exec(
+            select(User).where(User.username == username_data.username)
+        )
     ).first()
 
     if existing_user:
@@ -77,65 +98,75 @@ def set_my_username(
     if not re.match(r"^[a-zA-Z0-9_]+$", username_data.username):
         raise HTTPException(status_code=422, detail="Invalid username format.")
 
-    # set the username and avatar seed
-    current_user.username = username_data.username
-    current_user.avatar_seed = username_data.avatar_seed
-    session.add(current_user)
-    session.commit()
-    session.refresh(current_user)
+    # set the username and avatar seed. current_user may come from the
+    # principal cache and be stale, so the database decides whether the
+    # username is still unset
+    result = await session.exec(
+        update(User)
+        .where(User.id == current_user.id)
+        .where(User.username == None)
+        .values(username=username_data.username, avatar_seed=username_data.avatar_seed)
+    )
+    if result.rowcount == 0:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Username has already been set for this account.",
+        )
+    await session.commit()
+    mark_write(current_user.id)
+    invalidate_principal(current_user.id)
+    user = await session.get(User, current_user.id)
 
-    if not current_user.referral_code:
+    if not user.referral_code:
         from src.services.referral import create_referral_code_for_user
 
-        referral_code = create_referral_code_for_user(session, current_user.id)
+        referral_code = await create_referral_code_for_user(session, user.id)
         if referral_code:
-            print(
-                f"Referral code {referral_code.code} generated for user {current_user.id}"
-            )
-            session.refresh(current_user)
+            print(f"Referral code {referral_code.code} generated for user {user.id}")
+            await session.refresh(user)
 
-    session.close()
-
-    print(f"Username {current_user.username} set for user {current_user.id}")
-    return current_user
+    print(f"Username {user.username} set for user {user.id}")
+    return user
 
 
 @router.patch("/me/bio", response_model=UserPublic, status_code=status.HTTP_200_OK)
-def set_my_bio(
+async def set_my_bio(
     bio_data: SetBioRequest,
     current_user: User = Depends(get_current_user),
-    session: Session = Depends(lambda: Session(engine)),
+    session: AsyncSession = Depends(get_async_session),
 ):
     """
     Sets the bio for the currently authenticated user.
     """
     current_user.bio = bio_data.bio
     session.add(current_user)
-    session.commit()
-    session.refresh(current_user)
-    session.close()
+    await session.commit()
+    mark_write(current_user.id)
+    invalidate_principal(current_user.id)
+    await session.refresh(current_user)
 
     print(f"Bio updated for user {current_user.id}")
     return current_user
 
 
 @router.get("/me", response_model=UserPublic, status_code=status.HTTP_200_OK)
-def read_users_me(current_user: User = Depends(get_current_user)):
+async def read_users_me(current_user: User = Depends(get_current_user)):
     """
     Get the profile data for the currently authenticated user.
     """
     return current_user
 
 @router.patch("/me/avatar", response_model=UserPublic, status_code=status.HTTP_200_OK) 
-def set_my_avatar(avatar_data: SetAvatarRequest, current_user: User = Depends(get_current_user), session: Session = Depends(lambda: Session(engine))): 
+async def set_my_avatar(avatar_data: SetAvatarRequest, current_user: User = Depends(get_current_user), session: AsyncSession = Depends(get_async_session)): 
     """ 
     Sets or updates the avatar seed for the currently authenticated user. 
     """ 
     current_user.avatar_seed = avatar_data.avatar_seed 
     session.add(current_user) 
-    session.commit() 
-    session.refresh(current_user) 
-    session.close() 
+    await session.commit() 
+    mark_write(current_user.id)
+    invalidate_principal(current_user.id)
+    await session.refresh(current_user) 
 
     print(f"Avatar seed updated for user {current_user.id}") 
     return current_user
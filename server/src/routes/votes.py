@@ -1,92 +1,73 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy import func
-from src.models.vote import Vote, VoteRequest
+from typing import Annotated, Optional
+from fastapi import APIRouter, Depends, HTTPException, Path
+from src.models.post import MAX_POST_ID
+from src.models.vote import VoteRequest
 from src.models.user import User
-from src.models.post import Post
 from src.services.auth import get_current_user
-from src.db import engine
-from sqlmodel import Session, select
-from datetime import datetime, timezone
+from src.services.votes import apply_vote_change
+from src.services.vote_buffer import vote_buffer
+from src.services.feed_cache import update_cached_score
+from src.services.events import publish_score_changed
+from src.db import async_session, mark_write
 
 router = APIRouter()
 
 
-@router.put("/{post_id}/vote")
-def set_vote(
-    post_id: int, vote_request: VoteRequest, user: User = Depends(get_current_user)
-):
+async def record_vote(user_id: int, post_id: int, vote_type: Optional[int]) -> int:
     """
-    Creates new vote or updates existing vote to the specified type
+    Cast (or with None remove) a vote and return the new score of the post.
+    With the vote buffer enabled the vote is only queued and the score is
+    provisional until the buffer is flushed.
     """
-    with Session(engine) as session:
-        post = session.exec(
-            select(Post).where(Post.id == post_id).where(Post.deleted == False)
-        ).first()
-        if post is None:
-            raise HTTPException(status_code=404, detail="Post not found")
-
-        existing_vote = session.exec(
-            select(Vote).where(Vote.user_id == user.id).where(Vote.post_id == post_id)
-        ).first()
-
-        if existing_vote:
-            if existing_vote.vote_type == vote_request.vote_type:
-                pass
-            else:
-                existing_vote.vote_type = vote_request.vote_type
-                existing_vote.updated_at = datetime.now(timezone.utc)
-                session.add(existing_vote)
+    async with async_session() as session:
+        if vote_buffer.enabled:
+            score = await vote_buffer.submit(session, user_id, post_id, vote_type)
         else:
-            new_vote = Vote(
-                user_id=user.id, post_id=post_id, vote_type=vote_request.vote_type
-            )
-            session.add(new_vote)
+            score = await apply_vote_change(session, user_id, post_id, vote_type)
+            if score is not None:
+                await session.commit()
+    if score is None:
+        raise HTTPException(status_code=404, detail="Post not found")
+
+    mark_write(user_id)
+    update_cached_score(post_id, score)
+    publish_score_changed(post_id, score)
+    return score
 
-        session.commit()
 
-        score = session.exec(
-            select(func.coalesce(func.sum(Vote.vote_type), 0)).where(
-                Vote.post_id == post_id
-            )
-        ).first()
+@router.put("/{post_id}/vote")
+async def set_vote(
+    post_id: Annotated[int, Path(ge=1, le=MAX_POST_ID)],
+    vote_request: VoteRequest,
+    user: User = Depends(get_current_user),
+):
+    """
+    Creates new vote or updates existing vote to the specified type
+    """
+    if vote_request.vote_type not in (1, -1):
+        raise HTTPException(status_code=400, detail="Invalid vote type")
 
-        return {
-            "message": "Vote updated successfully",
-            "post": {
-                "id": post_id,
-                "score": score,
-                "user_vote": vote_request.vote_type,
-            },
-        }
+    score = await record_vote(user.id, post_id, vote_request.vote_type)
+    return {
+        "message": "Vote updated successfully",
+        "post": {
+            "id": post_id,
+            "score": score,
+            "user_vote": vote_request.vote_type,
+        },
+    }
 
 
 @router.delete("/{post_id}/vote")
-def remove_vote(post_id: int, user: User = Depends(get_current_user)):
+async def remove_vote(
+    post_id: Annotated[int, Path(ge=1, le=MAX_POST_ID)],
+    user: User = Depends(get_current_user),
+):
     """
     Removes vote if it exists, does nothing if no vote exists
     """
-    with Session(engine) as session:
-        post = session.exec(
-            select(Post).where(Post.id == post_id).where(Post.deleted == False)
-        ).first()
-        if post is None:
-            raise HTTPException(status_code=404, detail="Post not found")
-
-        existing_vote = session.exec(
-            select(Vote).where(Vote.user_id == user.id).where(Vote.post_id == post_id)
-        ).first()
-
-        if existing_vote:
-            session.delete(existing_vote)
-            session.commit()
-
-        score = session.exec(
-            select(func.coalesce(func.sum(Vote.vote_type), 0)).where(
-                Vote.post_id == post_id
-            )
-        ).first()
-
-        return {
-            "message": "Vote removed successfully",
-            "post": {"id": post_id, "score": score, "user_vote": None},
-        }
+    score = await record_vote(user.id, post_id, None)
+    return {
+        "message": "Vote removed successfully",
+        "post": {"id": post_id, "score": score, "user_vote": None},
+    }
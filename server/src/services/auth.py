@@ -3,9 +3,13 @@ import hashlib
 from fastapi import Depends, HTTPException, status, Cookie
 
 # from fastapi.security import OAuth2PasswordBearer
+from sqlalchemy import update
+from sqlalchemy.orm import make_transient_to_detached
 from sqlmodel import Session, select
-from src.db import engine
+from sqlmodel.ext.asyncio.session import AsyncSession
+from src.db import read_session, mark_write
 from src.models.user import User
+from src.services.cache import TTLCache
 import jwt
 import os
 from typing import Annotated
@@ -25,6 +29,46 @@ if not ENCRYPTION_KEY:
 
 fernet = Fernet(ENCRYPTION_KEY.encode())
 
+PRINCIPAL_CACHE_ENABLED = os.getenv("PRINCIPAL_CACHE_ENABLED", "true").lower() == "true"
+PRINCIPAL_CACHE_TTL_SECONDS = float(os.getenv("PRINCIPAL_CACHE_TTL_SECONDS", "60"))
+PRINCIPAL_CACHE_MAX_USERS = int(os.getenv("PRINCIPAL_CACHE_MAX_USERS", "10000"))
+
+# user id -> column values of the authenticated user. Values are cached
+# rather than the User itself, every request gets its own instance so routes
+# can change it and add it to their session. The cache lives in the worker
+# process, other workers only see a change once their entry expires.
+principal_cache = TTLCache(
+    maxsize=PRINCIPAL_CACHE_MAX_USERS,
+    ttl=PRINCIPAL_CACHE_TTL_SECONDS,
+    enabled=PRINCIPAL_CACHE_ENABLED,
+)
+
+
+TOKEN_VERSION_TTL_SECONDS = float(os.getenv("TOKEN_VERSION_TTL_SECONDS", "60"))
+
+# user id -> current token version, lets get_current_user_id check tokens
+# for revocation without a query on every request
+token_versions = TTLCache(
+    maxsize=PRINCIPAL_CACHE_MAX_USERS, ttl=TOKEN_VERSION_TTL_SECONDS
+)
+
+
+def invalidate_principal(user_id: int) -> None:
+    """Drop a cached user, call it after the user row changed"""
+    principal_cache.pop(user_id)
+
+
+def cached_principal(values: dict) -> User:
+    """A detached User built from cached values, as if loaded by a query"""
+    tags = values["tags"]
+    user = User(**{**values, "tags": list(tags) if tags is not None else None})
+    # columns that were not loaded (the deferred ones) stay unloaded instead
+    # of taking their defaults
+    for name in User.model_fields.keys() - values.keys():
+        user.__dict__.pop(name, None)
+    make_transient_to_detached(user)
+    return user
+
 
 def encrypt_refresh_token(token: str) -> str:
     if not token:
@@ -55,15 +99,28 @@ def decrypt_refresh_token(token: str) -> str:
 #     )
 
 
-async def get_current_user(
-    access_token: Annotated[str | None, Cookie()] = None,
-) -> User:
-    credentials_exception = HTTPException(
+def invalid_credentials_exception() -> HTTPException:
+    return HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         # headers={"WWW-Authenticate": "Bearer"},
     )
 
+
+def revoked_token_exception() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Token has been revoked",
+    )
+
+
+def decode_access_token(access_token: str | None) -> tuple[int, int]:
+    """
+    Verify the access token cookie and return its (user id, token version).
+    Tokens issued before token versions existed count as version 0.
+    """
+    credentials_exception = invalid_credentials_exception()
+
     try:
         JWT_SECRET_KEY = os.getenv("JWT_SECRET_KEY")
         if not JWT_SECRET_KEY:
@@ -95,25 +152,102 @@ async def get_current_user(
             status_code=500, detail="Internal server configuration error"
         )
 
-    with Session(engine) as session:
-        try:
-            db_user_id = int(user_id)
-        except ValueError:
-            print(f"Invalid user ID in JWT 'sub': {user_id}")
-            raise credentials_exception
+    try:
+        return int(user_id), int(payload.get("ver", 0))
+    except ValueError:
+        print(f"Invalid user ID or version in JWT: {user_id}")
+        raise credentials_exception
+
 
-        user = session.exec(select(User).where(User.id == db_user_id)).first()
+async def get_current_user(
+    access_token: Annotated[str | None, Cookie()] = None,
+) -> User:
+    db_user_id, token_version = decode_access_token(access_token)
+
+    values = principal_cache.get(db_user_id)
+    if values is not None:
+        user = cached_principal(values)
+    else:
+        async with read_session(db_user_id) as session:
+            user = (
+                await session.exec(select(User).where(User.id == db_user_id))
+            ).first()
         if user is None:
+            print(f"User with ID {db_user_id} not found in database")
+            raise invalid_credentials_exception()
+        principal_cache.set(db_user_id, user.model_dump())
+        token_versions.set(db_user_id, user.token_version)
+
+    if token_version != user.token_version:
+        print(f"Revoked token used for user {user.id}")
+        raise revoked_token_exception()
+
+    # # if the user has not completed their profile setup he is prevented from accessing protected routes.
+    # # TODO: This can be improved in the future
+    # if user.username is None:
+    #     print("User profile setup not complete")
+    #     raise HTTPException(
+    #         status_code=status.HTTP_403_FORBIDDEN,
+    #         detail="User profile setup not complete",
+    #     )
+    print(f"Successfully authenticated user {user.id} via cookie.")
+    return user
+
+
+async def get_current_user_id(
+    access_token: Annotated[str | None, Cookie()] = None,
+) -> int:
+    """
+    Claims-only alternative to get_current_user for routes that only need
+    the viewer's id. The signed token is trusted as is, apart from its
+    version, which is checked against a per-worker cache refreshed from the
+    database at most every TOKEN_VERSION_TTL_SECONDS. Revoking a user's
+    tokens therefore takes effect here within that window.
+    """
+    user_id, token_version = decode_access_token(access_token)
+
+    current_version = token_versions.get(user_id)
+    if current_version is None:
+        async with read_session(user_id) as session:
+            current_version = (
+                await session.exec(
+                    select(User.token_version).where(User.id == user_id)
+                )
+            ).first()
+        if current_version is None:
             print(f"User with ID {user_id} not found in database")
-            raise credentials_exception
+            raise invalid_credentials_exception()
+        token_versions.set(user_id, current_version)
+
+    if token_version != current_version:
+        print(f"Revoked token used for user {user_id}")
+        raise revoked_token_exception()
+    return user_id
 
-        # # if the user has not completed their profile setup he is prevented from accessing protected routes.
-        # # TODO: This can be improved in the future
-        # if user.username is None:
-        #     print("User profile setup not complete")
-        #     raise HTTPException(
-        #         status_code=status.HTTP_403_FORBIDDEN,
-        #         detail="User profile setup not complete",
-        #     )
-        print(f"Successfully authenticated user {user.id} via cookie.")
-        return user
+
+async def revoke_tokens(session: AsyncSession, user_id: int) -> None:
+    """Invalidate every token issued to a user so far, e.g. on logout or a ban"""
+    await session.exec(
+        update(User)
+        .where(User.id == user_id)
+        .values(token_version=User.token_version + 1)
+    )
+    await session.commit()
+    # keep this worker from reading the old version back from a replica
+    mark_write(user_id)
+    token_versions.pop(user_id)
+    invalidate_principal(user_id)
+
+
+def revoke_user_tokens(session: Session, username: str) -> bool:
+    """
+    Sync variant of revoke_tokens for src/manage.py, looks the user up by
+    username. Running workers notice within TOKEN_VERSION_TTL_SECONDS.
+    """
+    result = session.exec(
+        update(User)
+        .where(User.username == username)
+        .values(token_version=User.token_version + 1)
+    )
+    session.commit()
+    return result.rowcount > 0
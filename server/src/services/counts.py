@@ -0,0 +1,65 @@
+from typing import Optional
+from sqlalchemy.dialects.postgresql import insert
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from src.models.counter import PostCounter
+from src.services.cache import TTLCache
+
+GLOBAL_KEY = "global"
+ESTIMATE_TTL_SECONDS = 30
+ESTIMATE_MAX_KEYS = 10000
+
+# counter key -> count, only used by the "estimated" count mode
+count_estimates = TTLCache(maxsize=ESTIMATE_MAX_KEYS, ttl=ESTIMATE_TTL_SECONDS)
+
+
+def author_key(author_id: int) -> str:
+    return f"author:{author_id}"
+
+
+async def adjust_post_counts(session: AsyncSession, author_id: int, delta: int) -> None:
+    """
+    Add delta to the global and per-author live post counters.
+    Runs inside the caller's transaction, nothing is committed here.
+    """
+    statement = insert(PostCounter).values(
+        [
+            {"key": author_key(author_id), "count": delta},
+            {"key": GLOBAL_KEY, "count": delta},
+        ]
+    )
+    statement = statement.on_conflict_do_update(
+        index_elements=[PostCounter.key],
+        set_={"count": PostCounter.count + statement.excluded.count},
+    )
+    await session.exec(statement)
+
+
+async def get_post_count(
+    session: AsyncSession, author_id: Optional[int] = None, mode: str = "exact"
+) -> Optional[int]:
+    """
+    Get the number of live posts, globally or for a single author.
+
+    mode "exact" reads the maintained counter row, "estimated" may serve a
+    value up to ESTIMATE_TTL_SECONDS old from memory and "none" skips the
+    lookup entirely.
+    """
+    if mode == "none":
+        return None
+
+    key = GLOBAL_KEY if author_id is None else author_key(author_id)
+    if mode == "estimated":
+        cached = count_estimates.get(key)
+        if cached is not None:
+            return cached
+
+    count = (
+        await session.exec(
+            select(PostCounter.count).where(PostCounter.key == key)
+        )
+    ).first()
+    count = count or 0
+    if mode == "estimated":
+        count_estimates.set(key, count)
+    return count
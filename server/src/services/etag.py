@@ -0,0 +1,41 @@
+import hashlib
+from typing import Iterable, Optional
+from fastapi import Request, Response
+
+# responses depend on the access_token cookie, so shared caches must not
+# reuse them across users and browsers must revalidate every time
+CACHE_HEADERS = {"Cache-Control": "private, no-cache", "Vary": "Cookie"}
+
+
+def make_etag(*parts) -> str:
+    """Weak ETag over the values a response is built from"""
+    digest = hashlib.sha1(repr(parts).encode("utf-8")).hexdigest()
+    return f'W/"{digest}"'
+
+
+def post_validator(post, author, score: int, user_vote: Optional[int]) -> tuple:
+    """
+    The fields of a PostPublic that can change after creation. Post content
+    is immutable, so the id stands in for it.
+    """
+    return (post.id, score, author.username, author.avatar_seed, user_vote)
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    # weak comparison, W/ prefixes are ignored on both sides
+    candidates: Iterable[str] = (tag.strip() for tag in if_none_match.split(","))
+    return any(tag.removeprefix("W/") == etag.removeprefix("W/") for tag in candidates)
+
+
+def not_modified(etag: str) -> Response:
+    return Response(status_code=304, headers={"ETag": etag, **CACHE_HEADERS})
+
+
+def set_etag(response: Response, etag: str) -> None:
+    response.headers["ETag"] = etag
+    response.headers.update(CACHE_HEADERS)
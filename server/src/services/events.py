@@ -0,0 +1,73 @@
+import asyncio
+import json
+from typing import Optional, Set
+
+SUBSCRIBER_QUEUE_SIZE = 100
+
+
+class Subscription:
+    """A single stream connection, fed through a bounded queue"""
+
+    def __init__(self, maxsize: int):
+        self.queue: "asyncio.Queue[str]" = asyncio.Queue(maxsize=maxsize)
+        # set when the subscriber fell too far behind and was dropped
+        self.overflowed = False
+
+
+class EventBroker:
+    """
+    In-process pub/sub for live feed events.
+
+    Publishing never blocks the writer: each subscriber has a bounded queue
+    and a subscriber whose queue is full is dropped, its stream ends and the
+    client is expected to reconnect and refetch. Events are only delivered to
+    connections on the same worker process.
+    """
+
+    def __init__(self, queue_size: int = SUBSCRIBER_QUEUE_SIZE):
+        self.queue_size = queue_size
+        self.subscribers: Set[Subscription] = set()
+        self.published = 0
+        self.dropped_subscribers = 0
+
+    def subscribe(self) -> Subscription:
+        subscription = Subscription(self.queue_size)
+        self.subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        self.subscribers.discard(subscription)
+
+    def publish(self, event: str, data: dict) -> None:
+        # serialized once and shared by every subscriber
+        message = f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+        self.published += 1
+        for subscription in list(self.subscribers):
+            try:
+                subscription.queue.put_nowait(message)
+            except asyncio.QueueFull:
+                subscription.overflowed = True
+                self.subscribers.discard(subscription)
+                self.dropped_subscribers += 1
+
+    def stats(self) -> dict:
+        return {
+            "subscribers": len(self.subscribers),
+            "published": self.published,
+            "dropped_subscribers": self.dropped_subscribers,
+        }
+
+
+broker = EventBroker()
+
+
+def publish_new_post(post: dict) -> None:
+    broker.publish("new_post", post)
+
+
+def publish_post_deleted(post_id: int) -> None:
+    broker.publish("post_deleted", {"id": post_id})
+
+
+def publish_score_changed(post_id: int, score: Optional[int]) -> None:
+    broker.publish("score_changed", {"id": post_id, "score": score})
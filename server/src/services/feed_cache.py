@@ -0,0 +1,45 @@
+import os
+from typing import List, Optional
+from dotenv import load_dotenv, find_dotenv
+from pydantic import BaseModel
+from src.models.post import PostPublic
+from src.services.cache import TTLCache
+
+load_dotenv(find_dotenv())
+
+FEED_CACHE_ENABLED = os.getenv("FEED_CACHE_ENABLED", "true").lower() == "true"
+FEED_CACHE_TTL_SECONDS = float(os.getenv("FEED_CACHE_TTL_SECONDS", "10"))
+FEED_CACHE_MAX_PAGES = int(os.getenv("FEED_CACHE_MAX_PAGES", "128"))
+
+
+class FeedPage(BaseModel):
+    """The viewer independent part of a feed page, user_vote is left empty"""
+
+    items: List[PostPublic]
+    total: Optional[int]
+    next_cursor: Optional[str]
+
+
+# NOTE: the cache lives in the worker process, writes on other workers are
+# only picked up once the entry expires, so keep the ttl short.
+feed_cache = TTLCache(
+    maxsize=FEED_CACHE_MAX_PAGES,
+    ttl=FEED_CACHE_TTL_SECONDS,
+    enabled=FEED_CACHE_ENABLED,
+)
+
+
+def invalidate_feed() -> None:
+    """Drop every cached page, used when posts are created or deleted"""
+    feed_cache.clear()
+
+
+def update_cached_score(post_id: int, score: int) -> None:
+    """Patch the score of a post in every cached page it appears on"""
+
+    def patch(page: FeedPage) -> None:
+        for index, item in enumerate(page.items):
+            if item.id == post_id:
+                page.items[index] = item.model_copy(update={"score": score})
+
+    feed_cache.update_values(patch)
@@ -0,0 +1,109 @@
+import asyncio
+import os
+import re
+import time
+from typing import Dict, Optional
+from dotenv import load_dotenv, find_dotenv
+from google.auth import jwt as google_jwt
+from src.services.http_client import http_client
+
+load_dotenv(find_dotenv())
+
+# both can point at a local stub of the oauth server
+GOOGLE_TOKEN_URL = os.getenv("GOOGLE_TOKEN_URL", "https://oauth2.googleapis.com/token")
+GOOGLE_CERTS_URL = os.getenv(
+    "GOOGLE_CERTS_URL", "https://www.googleapis.com/oauth2/v1/certs"
+)
+# used when the certs response carries no max-age
+GOOGLE_CERTS_DEFAULT_TTL_SECONDS = float(
+    os.getenv("GOOGLE_CERTS_DEFAULT_TTL_SECONDS", "300")
+)
+GOOGLE_ISSUERS = ["accounts.google.com", "https://accounts.google.com"]
+
+MAX_AGE = re.compile(r"(?:^|,)\s*max-age\s*=\s*(\d+)", re.IGNORECASE)
+
+
+def max_age(cache_control: Optional[str]) -> Optional[int]:
+    """The max-age of a Cache-Control header, None if it has none"""
+    if not cache_control:
+        return None
+    match = MAX_AGE.search(cache_control)
+    return int(match.group(1)) if match else None
+
+
+class GoogleCerts:
+    """
+    Google's id token signing certificates, kept until the max-age the
+    certs endpoint sends expires. Concurrent logins share one fetch, and a
+    token signed with a key we do not know yet refreshes the certs once, so
+    key rotation does not wait for the cached copy to expire.
+    """
+
+    def __init__(self, url: str, default_ttl: float):
+        self.url = url
+        self.default_ttl = default_ttl
+        self.certs: Dict[str, str] = {}
+        self.expires_at = 0.0
+        self.lock = asyncio.Lock()
+        self.hits = 0
+        self.fetches = 0
+        self.failed_fetches = 0
+
+    async def fetch(self) -> Dict[str, str]:
+        try:
+            response = await http_client.get(self.url)
+            response.raise_for_status()
+            certs = response.json()
+        except Exception:
+            self.failed_fetches += 1
+            raise
+        ttl = max_age(response.headers.get("cache-control"))
+        self.certs = certs
+        self.expires_at = time.monotonic() + (
+            self.default_ttl if ttl is None else ttl
+        )
+        self.fetches += 1
+        return certs
+
+    async def get(self, refresh: bool = False) -> Dict[str, str]:
+        if not refresh and time.monotonic() < self.expires_at:
+            self.hits += 1
+            return self.certs
+        fetched_at = self.expires_at
+        async with self.lock:
+            # another login refreshed them while we waited
+            if self.expires_at != fetched_at and time.monotonic() < self.expires_at:
+                self.hits += 1
+                return self.certs
+            return await self.fetch()
+
+    async def verify_id_token(self, token: str, audience: str) -> dict:
+        """
+        Verify the signature, expiry, audience and issuer of a Google id
+        token against the cached certs. Raises ValueError if it is invalid.
+        """
+        kid = google_jwt.decode_header(token).get("kid")
+        certs = await self.get()
+        if kid is not None and kid not in certs:
+            certs = await self.get(refresh=True)
+        id_info = google_jwt.decode(token, certs=certs, audience=audience)
+        if id_info.get("iss") not in GOOGLE_ISSUERS:
+            raise ValueError(
+                f"Wrong issuer. 'iss' should be one of the following: {GOOGLE_ISSUERS}"
+            )
+        return id_info
+
+    def stats(self) -> dict:
+        return {
+            "url": self.url,
+            "keys": len(self.certs),
+            "expires_in": max(round(self.expires_at - time.monotonic(), 1), 0),
+            "hits": self.hits,
+            "fetches": self.fetches,
+            "failed_fetches": self.failed_fetches,
+        }
+
+
+google_certs = GoogleCerts(
+    url=GOOGLE_CERTS_URL, default_ttl=GOOGLE_CERTS_DEFAULT_TTL_SECONDS
+)
@@ -0,0 +1,69 @@
+import os
+from typing import Optional
+import httpx
+from dotenv import load_dotenv, find_dotenv
+
+load_dotenv(find_dotenv())
+
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "100"))
+HTTP_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("HTTP_MAX_KEEPALIVE_CONNECTIONS", "20"))
+HTTP_TIMEOUT_SECONDS = float(os.getenv("HTTP_TIMEOUT_SECONDS", "10"))
+
+
+class HttpClient:
+    """
+    One httpx client for the lifetime of the app, so outgoing requests reuse
+    pooled keep-alive connections instead of a new TLS handshake each time.
+    """
+
+    def __init__(self, max_connections: int, max_keepalive: int, timeout: float):
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive,
+        )
+        self.timeout = timeout
+        self.client: Optional[httpx.AsyncClient] = None
+        self.requests = 0
+        self.failed_requests = 0
+
+    def start(self) -> None:
+        if self.client is None:
+            self.client = httpx.AsyncClient(limits=self.limits, timeout=self.timeout)
+
+    async def stop(self) -> None:
+        if self.client is not None:
+            await self.client.aclose()
+            self.client = None
+
+    async def request(self, method: str, url: str, **kwargs) -> httpx.Response:
+        if self.client is None:
+            raise RuntimeError("HTTP client is not started")
+        self.requests += 1
+        try:
+            return await self.client.request(method, url, **kwargs)
+        except httpx.HTTPError:
+            self.failed_requests += 1
+            raise
+
+    async def get(self, url: str, **kwargs) -> httpx.Response:
+        return await self.request("GET", url, **kwargs)
+
+    async def post(self, url: str, **kwargs) -> httpx.Response:
+        return await self.request("POST", url, **kwargs)
+
+    def stats(self) -> dict:
+        return {
+            "started": self.client is not None,
+            "max_connections": self.limits.max_connections,
+            "max_keepalive_connections": self.limits.max_keepalive_connections,
+            "timeout": self.timeout,
+            "requests": self.requests,
+            "failed_requests": self.failed_requests,
+        }
+
+
+http_client = HttpClient(
+    max_connections=HTTP_MAX_CONNECTIONS,
+    max_keepalive=HTTP_MAX_KEEPALIVE_CONNECTIONS,
+    timeout=HTTP_TIMEOUT_SECONDS,
+)
@@ -0,0 +1,94 @@
+from datetime import date, datetime, timedelta, timezone
+import sqlalchemy as sa
+from sqlalchemy import delete, func, text
+from sqlalchemy.dialects.postgresql import insert
+from sqlmodel import Session, select
+from src.models.leaderboard import PostDailyScore
+
+# window -> number of daily buckets it spans, None means all time
+TOP_WINDOWS = {"day": 1, "week": 7, "month": 30, "all": None}
+RETENTION_DAYS = max(days for days in TOP_WINDOWS.values() if days)
+
+
+def today() -> date:
+    return datetime.now(timezone.utc).date()
+
+
+def vote_day_expression(created_at):
+    """The daily bucket a vote belongs to, as a SQL expression"""
+    return sa.cast(func.timezone("UTC", created_at), sa.Date)
+
+
+def bucket_upsert(rows):
+    """
+    Upsert statement adding the (day, post_id, score) rows of the given select
+    to the daily buckets. It is attached as a CTE to the post counter UPDATE,
+    so it costs no extra round trip.
+    """
+    statement = insert(PostDailyScore).from_select(
+        ["day", "post_id", "score"], rows
+    )
+    return statement.on_conflict_do_update(
+        index_elements=[PostDailyScore.day, PostDailyScore.post_id],
+        set_={"score": PostDailyScore.score + statement.excluded.score},
+    )
+
+
+def window_scores(window: str):
+    """Subquery of (post_id, window_score) for a time window other than "all" """
+    cutoff = today() - timedelta(days=TOP_WINDOWS[window] - 1)
+    window_score = func.sum(PostDailyScore.score).label("window_score")
+    return (
+        select(PostDailyScore.post_id, window_score)
+        .where(PostDailyScore.day >= cutoff)
+        .group_by(PostDailyScore.post_id)
+        .subquery()
+    )
+
+
+def rebuild_leaderboards(session: Session) -> int:
+    """
+    Rebuild the daily buckets from the vote table and drop buckets that no
+    window needs anymore. Returns the number of buckets written.
+
+    Votes whose deltas still sit in score shards are counted here and again
+    when the shards are compacted, so the pending shard deltas are taken off
+    the recount. A vote and its shard delta commit together, the single
+    statement sees either both or neither.
+
+    The buckets are locked against writes until the rebuild commits. A vote
+    committing between the DELETE and the INSERT would otherwise create a
+    bucket the INSERT then collides with. Votes wait for the lock and add
+    their delta to the rebuilt buckets afterwards.
+    """
+    cutoff = today() - timedelta(days=RETENTION_DAYS - 1)
+    session.exec(text("LOCK TABLE post_daily_score IN EXCLUSIVE MODE"))
+    session.exec(delete(PostDailyScore))
+    result = session.exec(
+        text(
+            """
+            INSERT INTO post_daily_score (day, post_id, score)
+            SELECT day, post_id, SUM(score)
+            FROM (
+                SELECT (created_at AT TIME ZONE 'UTC')::date AS day, post_id, vote_type AS score
+                FROM vote
+                WHERE (created_at AT TIME ZONE 'UTC')::date >= :cutoff
+                UNION ALL
+                SELECT day, post_id, -score
+                FROM post_score_shard
+                WHERE day >= :cutoff
+            ) AS scores
+            GROUP BY 1, 2
+            """
+        ).bindparams(cutoff=cutoff)
+    )
+    session.commit()
+    return result.rowcount
+
+
+def prune_leaderboards(session: Session) -> int:
+    """Drop buckets older than the longest window"""
+    cutoff = today() - timedelta(days=RETENTION_DAYS - 1)
+    result = session.exec(delete(PostDailyScore).where(PostDailyScore.day < cutoff))
+    session.commit()
+    return result.rowcount
@@ -0,0 +1,43 @@
+import base64
+from datetime import datetime
+from typing import Optional, Tuple
+
+
+def _encode(sort_key: str, post_id: int) -> str:
+    raw = f"{sort_key}|{post_id}".encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def _decode(cursor: str) -> Tuple[str, int]:
+    padded = cursor + "=" * (-len(cursor) % 4)
+    raw = base64.urlsafe_b64decode(padded.encode("ascii")).decode("utf-8")
+    sort_key, post_id = raw.split("|", 1)
+    return sort_key, int(post_id)
+
+
+def encode_cursor(created_at: datetime, post_id: int) -> str:
+    """Encode the (created_at, id) position of a post into an opaque cursor"""
+    return _encode(created_at.isoformat(), post_id)
+
+
+def decode_cursor(cursor: str) -> Optional[Tuple[datetime, int]]:
+    """Decode an opaque cursor, returns None if the cursor is malformed"""
+    try:
+        created_at, post_id = _decode(cursor)
+        return datetime.fromisoformat(created_at), post_id
+    except (ValueError, UnicodeError):
+        return None
+
+
+def encode_rank_cursor(rank: float, post_id: int) -> str:
+    """Encode the (rank, id) position of a post into an opaque cursor"""
+    return _encode(repr(rank), post_id)
+
+
+def decode_rank_cursor(cursor: str) -> Optional[Tuple[float, int]]:
+    """Decode an opaque rank cursor, returns None if the cursor is malformed"""
+    try:
+        rank, post_id = _decode(cursor)
+        return float(rank), post_id
+    except (ValueError, UnicodeError):
+        return None
@@ -0,0 +1,91 @@
+import time
+from bisect import bisect_left
+from typing import List
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import TimeoutError
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+# upper bounds of the checkout wait histogram buckets, in milliseconds
+WAIT_BUCKETS_MS = [1, 5, 10, 25, 50, 100, 250, 500, 1000, 5000]
+
+
+class PoolStats:
+    """
+    Live statistics of one engine's connection pool: how many connections
+    are in use, how long requests waited for one and how often connections
+    were opened and closed.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.engine = None
+        self.waits: List[int] = [0] * (len(WAIT_BUCKETS_MS) + 1)
+        self.total_wait_seconds = 0.0
+        self.timeouts = 0
+        self.connects = 0
+        self.closes = 0
+        self.invalidations = 0
+
+    def observe_wait(self, seconds: float) -> None:
+        self.waits[bisect_left(WAIT_BUCKETS_MS, seconds * 1000)] += 1
+        self.total_wait_seconds += seconds
+
+    def attach(self, engine: Engine) -> None:
+        """Listen to the pool events of a (sync) engine"""
+        self.engine = engine
+
+        @event.listens_for(engine, "connect")
+        def on_connect(dbapi_connection, connection_record):
+            self.connects += 1
+
+        @event.listens_for(engine, "close")
+        def on_close(dbapi_connection, connection_record):
+            self.closes += 1
+
+        @event.listens_for(engine, "invalidate")
+        def on_invalidate(dbapi_connection, connection_record, exception):
+            self.invalidations += 1
+
+    def stats(self) -> dict:
+        pool = self.engine.pool
+        checkouts = sum(self.waits)
+        labels = [f"<={bound}ms" for bound in WAIT_BUCKETS_MS] + [
+            f">{WAIT_BUCKETS_MS[-1]}ms"
+        ]
+        return {
+            "size": pool.size(),
+            "checked_out": pool.checkedout(),
+            "checked_in": pool.checkedin(),
+            "overflow": max(pool.overflow(), 0),
+            "checkouts": checkouts,
+            "timeouts": self.timeouts,
+            "avg_wait_ms": (
+                round(self.total_wait_seconds / checkouts * 1000, 3) if checkouts else 0.0
+            ),
+            "wait_histogram": dict(zip(labels, self.waits)),
+            "connects": self.connects,
+            "closes": self.closes,
+            "invalidations": self.invalidations,
+        }
+
+
+def timed_pool_class(stats: PoolStats):
+    """
+    Pool class that records how long every checkout waited in stats. The
+    pool keeps its class when the engine recreates it, so the stats survive
+    engine.dispose().
+    """
+
+    class TimedQueuePool(AsyncAdaptedQueuePool):
+        def _do_get(self):
+            started = time.perf_counter()
+            try:
+                connection = super()._do_get()
+            except TimeoutError:
+                stats.timeouts += 1
+                raise
+            stats.observe_wait(time.perf_counter() - started)
+            return connection
+
+    return TimedQueuePool
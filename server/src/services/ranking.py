@@ -0,0 +1,25 @@
+import math
+from datetime import datetime, timezone
+import sqlalchemy as sa
+from sqlalchemy import func
+
+# reddit's "hot" formula: the log of the score plus the post time in units of
+# 12.5 hours. It only changes when the score changes, newer posts simply start
+# higher, so it can be stored on the row and indexed.
+HOT_EPOCH = datetime(2005, 12, 8, 7, 46, 43, tzinfo=timezone.utc)
+HOT_DECAY_SECONDS = 45000
+
+
+def hot_rank(score: int, created_at: datetime) -> float:
+    """Compute the hot rank of a post in python"""
+    order = math.log10(max(abs(score), 1))
+    sign = (score > 0) - (score < 0)
+    seconds = (created_at - HOT_EPOCH).total_seconds()
+    return sign * order + seconds / HOT_DECAY_SECONDS
+
+
+def hot_rank_expression(score, created_at):
+    """Same formula as hot_rank, as a SQL expression over the given columns"""
+    order = func.log(sa.cast(func.greatest(func.abs(score), 1), sa.Float))
+    seconds = sa.cast(func.extract("epoch", created_at), sa.Float) - HOT_EPOCH.timestamp()
+    return func.sign(score) * order + seconds / HOT_DECAY_SECONDS
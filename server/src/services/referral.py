@@ -1,6 +1,7 @@
 import random
 import string
-from sqlmodel import Session, select
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
 from src.models.user import User
 from src.models.referral import ReferralCode, Referral
 from typing import Optional, Tuple
@@ -14,12 +15,12 @@ def generate_referral_code() -> str:
         return code
 
 
-def create_referral_code_for_user(
-    session: Session, user_id: int
+async def create_referral_code_for_user(
+    session: AsyncSession, user_id: int
 ) -> Optional[ReferralCode]:
     """Create a new referral code for a user"""
-    existing_code = session.exec(
-        select(ReferralCode).where(ReferralCode.user_id == user_id)
+    existing_code = (
+        await session.exec(select(ReferralCode).where(ReferralCode.user_id == user_id))
     ).first()
 
     if existing_code:
@@ -31,8 +32,8 @@ def create_referral_code_for_user(
     while attempts < max_attempts:
         code = generate_referral_code()
 
-        existing = session.exec(
-            select(ReferralCode).where(ReferralCode.code == code)
+        existing = (
+            await session.exec(select(ReferralCode).where(ReferralCode.code == code))
         ).first()
 
         if not existing:
@@ -40,14 +41,14 @@ def create_referral_code_for_user(
                 code=code, user_id=user_id, is_active=True, max_uses=5, current_uses=0
             )
             session.add(referral_code)
-            session.commit()
-            session.refresh(referral_code)
+            await session.commit()
+            await session.refresh(referral_code)
 
-            user = session.get(User, user_id)
+            user = await session.get(User, user_id)
             if user:
                 user.referral_code = code
                 session.add(user)
-                session.commit()
+                await session.commit()
 
             return referral_code
 
@@ -56,12 +57,12 @@ def create_referral_code_for_user(
     return None
 
 
-def validate_referral_code(
-    session: Session, code: str
+async def validate_referral_code(
+    session: AsyncSession, code: str
 ) -> Tuple[bool, Optional[ReferralCode], Optional[User]]:
     """Validate a referral code and return its details"""
-    referral_code = session.exec(
-        select(ReferralCode).where(ReferralCode.code == code)
+    referral_code = (
+        await session.exec(select(ReferralCode).where(ReferralCode.code == code))
     ).first()
 
     if not referral_code:
@@ -73,18 +74,20 @@ def validate_referral_code(
     if referral_code.current_uses >= referral_code.max_uses:
         return False, referral_code, None
 
-    user = session.get(User, referral_code.user_id)
+    user = await session.get(User, referral_code.user_id)
 
     return True, referral_code, user
 
 
-def complete_referral_simple(
-    session: Session, referrer_id: int, referred_user_id: int, referral_code: str
+async def complete_referral_simple(
+    session: AsyncSession, referrer_id: int, referred_user_id: int, referral_code: str
 ) -> bool:
     """Mark a referral as completed when the referred user signs up"""
     try:
-        referral_code_obj = session.exec(
-            select(ReferralCode).where(ReferralCode.code == referral_code)
+        referral_code_obj = (
+            await session.exec(
+                select(ReferralCode).where(ReferralCode.code == referral_code)
+            )
         ).first()
 
         if not referral_code_obj:
@@ -104,27 +107,27 @@ def complete_referral_simple(
         if referral_code_obj.current_uses >= referral_code_obj.max_uses:
             referral_code_obj.is_active = False
 
-        referrer = session.get(User, referrer_id)
+        referrer = await session.get(User, referrer_id)
         if referrer:
             referrer.referral_count += 1
             session.add(referrer)
 
-        session.commit()
+        await session.commit()
         return True
 
     except Exception:
-        session.rollback()
+        await session.rollback()
         return False
 
 
-def get_user_referral_stats(session: Session, user_id: int) -> dict:
+async def get_user_referral_stats(session: AsyncSession, user_id: int) -> dict:
     """Get referral statistics for a user"""
-    user = session.get(User, user_id)
+    user = await session.get(User, user_id)
     if not user:
         return {}
 
-    referral_code = session.exec(
-        select(ReferralCode).where(ReferralCode.user_id == user_id)
+    referral_code = (
+        await session.exec(select(ReferralCode).where(ReferralCode.user_id == user_id))
     ).first()
 
     if not referral_code:
@@ -135,9 +138,11 @@ def get_user_referral_stats(session: Session, user_id: int) -> dict:
             "remaining_referrals": 5,
         }
 
-    successful_referrals = session.exec(
-        select(Referral).where(
-            Referral.referrer_id == user_id, Referral.status == "completed"
+    successful_referrals = (
+        await session.exec(
+            select(Referral).where(
+                Referral.referrer_id == user_id, Referral.status == "completed"
+            )
         )
     ).all()
 
@@ -0,0 +1,25 @@
+from typing import Any, Optional
+import orjson
+from fastapi.responses import ORJSONResponse
+from pydantic import BaseModel
+from src.services.etag import CACHE_HEADERS
+
+
+class FastResponse(ORJSONResponse):
+    """
+    ORJSONResponse that writes UTC datetimes with a Z suffix like pydantic
+    does, so the fast path sends the same bytes the validated path did
+    """
+
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_UTC_Z)
+
+
+def fast_response(content: BaseModel, etag: Optional[str] = None) -> FastResponse:
+    """
+    Serialize a response model built from trusted DB rows straight to JSON.
+    Returning a Response skips FastAPI's dump and re-validate pass against
+    response_model, which is still declared on the route for the docs.
+    """
+    headers = {"ETag": etag, **CACHE_HEADERS} if etag else None
+    return FastResponse(content.model_dump(), headers=headers)
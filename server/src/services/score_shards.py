@@ -0,0 +1,170 @@
+import asyncio
+import os
+import random
+import time
+from typing import Optional
+from dotenv import load_dotenv, find_dotenv
+from sqlalchemy import delete, func, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlmodel import Session, select
+from src.db import async_session
+from src.models.post import Post
+from src.models.score_shard import PostScoreShard
+from src.services.ranking import hot_rank_expression
+from src.services.leaderboard import bucket_upsert
+
+load_dotenv(find_dotenv())
+
+# 0 keeps the counters on the post row, otherwise votes are spread over this
+# many shard rows per post and folded back every few seconds
+SCORE_SHARDS = int(os.getenv("SCORE_SHARDS", "0"))
+SCORE_SHARD_COMPACT_SECONDS = float(os.getenv("SCORE_SHARD_COMPACT_SECONDS", "30"))
+
+
+def random_shard() -> int:
+    return random.randrange(SCORE_SHARDS)
+
+
+def score_expression():
+    """The current score of a post: its counter plus the deltas not folded yet"""
+    if not SCORE_SHARDS:
+        return Post.score
+    pending = (
+        select(func.coalesce(func.sum(PostScoreShard.score), 0))
+        .where(PostScoreShard.post_id == Post.id)
+        .scalar_subquery()
+    )
+    return Post.score + pending
+
+
+def shard_upsert(rows):
+    """
+    Upsert statement adding the (post_id, day, shard, score, upvotes,
+    downvotes) rows of the given select to the shard counters.
+    """
+    statement = insert(PostScoreShard).from_select(
+        ["post_id", "day", "shard", "score", "upvotes", "downvotes"], rows
+    )
+    return statement.on_conflict_do_update(
+        index_elements=[
+            PostScoreShard.post_id,
+            PostScoreShard.day,
+            PostScoreShard.shard,
+        ],
+        set_={
+            "score": PostScoreShard.score + statement.excluded.score,
+            "upvotes": PostScoreShard.upvotes + statement.excluded.upvotes,
+            "downvotes": PostScoreShard.downvotes + statement.excluded.downvotes,
+        },
+    )
+
+
+def compact_score_shards(session: Session) -> int:
+    """
+    Fold every shard into the post counters and the daily leaderboard
+    buckets. The shards are deleted and folded in one statement, so a vote
+    lands either before or after the fold, never in both or neither.
+    Returns the number of posts updated.
+    """
+    folded = (
+        delete(PostScoreShard)
+        .returning(
+            PostScoreShard.post_id,
+            PostScoreShard.day,
+            PostScoreShard.score,
+            PostScoreShard.upvotes,
+            PostScoreShard.downvotes,
+        )
+        .cte("folded")
+    )
+    per_post = (
+        select(
+            folded.c.post_id,
+            func.sum(folded.c.score).label("score"),
+            func.sum(folded.c.upvotes).label("upvotes"),
+            func.sum(folded.c.downvotes).label("downvotes"),
+        )
+        .group_by(folded.c.post_id)
+        .subquery("per_post")
+    )
+    buckets = bucket_upsert(
+        select(folded.c.day, folded.c.post_id, func.sum(folded.c.score)).group_by(
+            folded.c.day, folded.c.post_id
+        )
+    )
+
+    score = Post.score + per_post.c.score
+    result = session.exec(
+        update(Post)
+        .where(Post.id == per_post.c.post_id)
+        .values(
+            score=score,
+            hot_rank=hot_rank_expression(score, Post.created_at),
+            upvotes=Post.upvotes + per_post.c.upvotes,
+            downvotes=Post.downvotes + per_post.c.downvotes,
+        )
+        .add_cte(folded)
+        .add_cte(buckets.cte("buckets"))
+    )
+    session.commit()
+    return result.rowcount
+
+
+class ShardCompactor:
+    """Periodically folds the score shards while the app is running"""
+
+    def __init__(self, interval: float, enabled: bool = True):
+        self.enabled = enabled
+        self.interval = interval
+        self.task: Optional[asyncio.Task] = None
+        self.compactions = 0
+        self.failed_compactions = 0
+        self.folded_posts = 0
+        self.last_compaction_ms = 0.0
+
+    async def compact(self) -> int:
+        started = time.perf_counter()
+        async with async_session() as session:
+            count = await session.run_sync(compact_score_shards)
+        self.last_compaction_ms = round((time.perf_counter() - started) * 1000, 2)
+        self.compactions += 1
+        self.folded_posts += count
+        return count
+
+    async def run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.compact()
+            except Exception as e:
+                print(f"Error compacting score shards: {e}")
+                self.failed_compactions += 1
+
+    def start(self) -> None:
+        if self.enabled and self.task is None:
+            self.task = asyncio.create_task(self.run())
+
+    async def stop(self) -> None:
+        if self.task is not None:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+            self.task = None
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "shards": SCORE_SHARDS,
+            "interval": self.interval,
+            "compactions": self.compactions,
+            "failed_compactions": self.failed_compactions,
+            "folded_posts": self.folded_posts,
+            "last_compaction_ms": self.last_compaction_ms,
+        }
+
+
+shard_compactor = ShardCompactor(
+    interval=SCORE_SHARD_COMPACT_SECONDS, enabled=SCORE_SHARDS > 0
+)
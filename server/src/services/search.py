@@ -0,0 +1,32 @@
+import os
+import sqlalchemy as sa
+from dotenv import load_dotenv, find_dotenv
+from sqlalchemy import func, text
+from src.models.post import Post
+
+load_dotenv(find_dotenv())
+
+# must match the configuration of the generated post.search_vector column
+SEARCH_CONFIG = sa.literal_column("'english'")
+
+# only this many of the newest matches are ranked, a common word would
+# otherwise rank every post it appears in
+SEARCH_MAX_CANDIDATES = int(os.getenv("SEARCH_MAX_CANDIDATES", "1000"))
+SEARCH_TIMEOUT_MS = int(os.getenv("SEARCH_TIMEOUT_MS", "2000"))
+
+QUERY_CANCELED = "57014"
+
+
+def search_vector(table=Post.__table__):
+    """Stored tsvector of post content, indexed by ix_post_search_vector"""
+    return table.c.search_vector
+
+
+def search_query(q: str):
+    """Parse a user search string, supports quotes, OR and -exclusions"""
+    return func.websearch_to_tsquery(SEARCH_CONFIG, q)
+
+
+def search_timeout():
+    """Statement bounding the searches of the current transaction"""
+    return text(f"SET LOCAL statement_timeout = {int(SEARCH_TIMEOUT_MS)}")
@@ -0,0 +1,286 @@
+import asyncio
+import os
+import time
+from collections import defaultdict
+from typing import Dict, List, Optional, Set, Tuple
+from dotenv import load_dotenv, find_dotenv
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from src.db import async_session
+from src.models.post import Post
+from src.models.vote import Vote
+from src.services.votes import apply_vote_change
+from src.services.score_shards import score_expression
+from src.services.feed_cache import update_cached_score
+from src.services.events import publish_score_changed
+
+load_dotenv(find_dotenv())
+
+VOTE_BUFFER_ENABLED = os.getenv("VOTE_BUFFER_ENABLED", "false").lower() == "true"
+VOTE_BUFFER_MAX_SIZE = int(os.getenv("VOTE_BUFFER_MAX_SIZE", "500"))
+VOTE_BUFFER_FLUSH_SECONDS = float(os.getenv("VOTE_BUFFER_FLUSH_SECONDS", "1"))
+# votes held at most, counting a batch being written. Once it is reached, for
+# instance while flushes keep failing, new votes are written through
+VOTE_BUFFER_MAX_DEPTH = int(os.getenv("VOTE_BUFFER_MAX_DEPTH", "5000"))
+SHUTDOWN_FLUSH_ATTEMPTS = 3
+
+
+class PendingVote:
+    """The latest vote of a user on a post that is not written yet"""
+
+    def __init__(self, old_vote: Optional[int], new_vote: Optional[int]):
+        # vote stored in the database when the user was first buffered
+        self.old_vote = old_vote
+        # None removes the vote
+        self.new_vote = new_vote
+
+    @property
+    def delta(self) -> int:
+        return (self.new_vote or 0) - (self.old_vote or 0)
+
+
+class VoteBuffer:
+    """
+    Write-behind buffer for votes.
+
+    Votes are kept in memory keyed by (user_id, post_id), a later vote of the
+    same user on the same post replaces the earlier one. The buffer is written
+    in one transaction once it holds max_size votes or every flush_interval
+    seconds, whichever comes first, and on shutdown. The database still works
+    out the real score change when a vote is written, the buffer only keeps
+    enough state to answer with a provisional score.
+
+    Votes live in the worker process until they are flushed, a crash loses
+    them and votes of one user on different workers are written in flush
+    order rather than request order. Reads see a user's own buffered votes
+    through viewer_vote() on the worker that holds them.
+
+    At most max_depth votes are held. A new vote beyond that is written
+    through in the request, so failing flushes can not grow the buffer
+    without bound and the vote fails if the database does.
+    """
+
+    def __init__(
+        self,
+        max_size: int,
+        flush_interval: float,
+        enabled: bool = True,
+        max_depth: Optional[int] = None,
+    ):
+        self.enabled = enabled
+        self.max_size = max_size
+        self.flush_interval = flush_interval
+        self.max_depth = max_depth if max_depth is not None else max_size * 10
+        self.pending: Dict[Tuple[int, int], PendingVote] = {}
+        # the batch a flush is writing, until it committed or was put back
+        self.flushing: Dict[Tuple[int, int], PendingVote] = {}
+        # post_id -> sum of the deltas of its pending votes
+        self.pending_deltas: Dict[int, int] = defaultdict(int)
+        self.flush_lock = asyncio.Lock()
+        self.stopping: Optional[asyncio.Event] = None
+        self.flusher: Optional[asyncio.Task] = None
+        self.size_flushes: Set[asyncio.Task] = set()
+        self.accepted = 0
+        self.written_through = 0
+        self.flushes = 0
+        self.flushed_votes = 0
+        self.failed_flushes = 0
+        self.last_flush_seconds = 0.0
+        self.max_flush_seconds = 0.0
+        self.total_flush_seconds = 0.0
+
+    async def submit(
+        self,
+        session: AsyncSession,
+        user_id: int,
+        post_id: int,
+        vote_type: Optional[int],
+    ) -> Optional[int]:
+        """
+        Buffer a vote, None removes it. Returns the provisional score of the
+        post, or None if the post does not exist or was deleted.
+        """
+        key = (user_id, post_id)
+        if key not in self.pending and key not in self.flushing and self.full:
+            score = await apply_vote_change(session, user_id, post_id, vote_type)
+            if score is None:
+                return None
+            await session.commit()
+            self.written_through += 1
+            return score + self.pending_deltas.get(post_id, 0)
+
+        row = (
+            await session.exec(
+                select(score_expression(), Vote.vote_type)
+                .outerjoin(
+                    Vote, (Vote.post_id == Post.id) & (Vote.user_id == user_id)
+                )
+                .where(Post.id == post_id)
+                .where(Post.deleted == False)
+            )
+        ).first()
+        if row is None:
+            return None
+        score, stored_vote = row
+
+        vote = self.pending.get(key)
+        if vote is None:
+            vote = self.pending[key] = PendingVote(stored_vote, vote_type)
+        else:
+            self.pending_deltas[post_id] -= vote.delta
+            vote.new_vote = vote_type
+        self.pending_deltas[post_id] += vote.delta
+        self.accepted += 1
+
+        if len(self.pending) >= self.max_size and not self.size_flushes:
+            task = asyncio.create_task(self.try_flush())
+            self.size_flushes.add(task)
+            task.add_done_callback(self.size_flushes.discard)
+        return score + self.pending_deltas[post_id]
+
+    @property
+    def full(self) -> bool:
+        return len(self.pending) + len(self.flushing) >= self.max_depth
+
+    def viewer_vote(
+        self, user_id: int, post_id: int, stored_vote: Optional[int]
+    ) -> Optional[int]:
+        """The vote a user sees on a post, a buffered vote over the stored one"""
+        key = (user_id, post_id)
+        vote = self.pending.get(key) or self.flushing.get(key)
+        return stored_vote if vote is None else vote.new_vote
+
+    def viewer_votes(
+        self, user_id: int, post_ids: List[int], stored_votes: Dict[int, int]
+    ) -> Dict[int, int]:
+        """viewer_vote() for several posts, as {post_id: vote_type}"""
+        votes = {}
+        for post_id in post_ids:
+            vote = self.viewer_vote(user_id, post_id, stored_votes.get(post_id))
+            if vote is not None:
+                votes[post_id] = vote
+        return votes
+
+    async def flush(self) -> int:
+        """Write every pending vote in one transaction, returns how many"""
+        async with self.flush_lock:
+            if not self.pending:
+                return 0
+            batch, self.pending = self.pending, {}
+            self.pending_deltas = defaultdict(int)
+            self.flushing = batch
+
+            started = time.perf_counter()
+            try:
+                scores: Dict[int, int] = {}
+                async with async_session() as session:
+                    for (user_id, post_id), vote in batch.items():
+                        score = await apply_vote_change(
+                            session, user_id, post_id, vote.new_vote
+                        )
+                        if score is not None:
+                            scores[post_id] = score
+                    await session.commit()
+            except BaseException as e:
+                # cancellation included, the batch is not in pending anymore.
+                # Writing a vote twice is harmless, so it is safe to retry
+                # even if the commit went through.
+                print(f"Error flushing {len(batch)} buffered votes: {e!r}")
+                self.failed_flushes += 1
+                self.requeue(batch)
+                raise
+            finally:
+                self.flushing = {}
+                elapsed = time.perf_counter() - started
+                self.last_flush_seconds = elapsed
+                self.max_flush_seconds = max(self.max_flush_seconds, elapsed)
+                self.total_flush_seconds += elapsed
+
+            self.flushes += 1
+            self.flushed_votes += len(batch)
+            for post_id, score in scores.items():
+                update_cached_score(post_id, score)
+                publish_score_changed(post_id, score)
+            return len(batch)
+
+    def requeue(self, batch: Dict[Tuple[int, int], PendingVote]) -> None:
+        """
+        Put a batch that failed to flush back, newer votes take precedence.
+        submit() counts the batch while it is written, so together they stay
+        within max_depth.
+        """
+        for key, vote in batch.items():
+            newer = self.pending.get(key)
+            if newer is not None:
+                # the batch vote is what the database will hold before it
+                newer.old_vote = vote.old_vote
+            else:
+                self.pending[key] = vote
+        self.pending_deltas = defaultdict(int)
+        for (_, post_id), vote in self.pending.items():
+            self.pending_deltas[post_id] += vote.delta
+
+    async def try_flush(self) -> None:
+        try:
+            await self.flush()
+        except Exception:
+            # already logged, the votes are retried on the next flush
+            pass
+
+    async def run(self) -> None:
+        while not self.stopping.is_set():
+            try:
+                await asyncio.wait_for(self.stopping.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                await self.try_flush()
+
+    def start(self) -> None:
+        if self.enabled and self.flusher is None:
+            self.stopping = asyncio.Event()
+            self.flusher = asyncio.create_task(self.run())
+
+    async def stop(self) -> None:
+        """Stop the periodic flush and write whatever is still pending"""
+        if self.flusher is not None:
+            # the loop is not cancelled, a flush in progress runs to the end
+            self.stopping.set()
+            await self.flusher
+            self.flusher = None
+        if self.size_flushes:
+            await asyncio.gather(*self.size_flushes, return_exceptions=True)
+        for attempt in range(SHUTDOWN_FLUSH_ATTEMPTS):
+            try:
+                await self.flush()
+                return
+            except Exception:
+                await asyncio.sleep(2**attempt)
+        print(f"Lost {len(self.pending)} buffered votes on shutdown")
+
+    def stats(self) -> dict:
+        flushes = self.flushes + self.failed_flushes
+        return {
+            "enabled": self.enabled,
+            "depth": len(self.pending),
+            "flushing": len(self.flushing),
+            "max_size": self.max_size,
+            "max_depth": self.max_depth,
+            "flush_interval": self.flush_interval,
+            "accepted": self.accepted,
+            "written_through": self.written_through,
+            "flushes": self.flushes,
+            "failed_flushes": self.failed_flushes,
+            "flushed_votes": self.flushed_votes,
+            "last_flush_ms": round(self.last_flush_seconds * 1000, 2),
+            "max_flush_ms": round(self.max_flush_seconds * 1000, 2),
+            "avg_flush_ms": (
+                round(self.total_flush_seconds / flushes * 1000, 2) if flushes else 0.0
+            ),
+        }
+
+
+vote_buffer = VoteBuffer(
+    max_size=VOTE_BUFFER_MAX_SIZE,
+    flush_interval=VOTE_BUFFER_FLUSH_SECONDS,
+    enabled=VOTE_BUFFER_ENABLED,
+    max_depth=VOTE_BUFFER_MAX_DEPTH,
+)
@@ -0,0 +1,253 @@
+from typing import Dict, List, Optional
+import sqlalchemy as sa
+from sqlalchemy import (
+    bindparam,
+    case,
+    delete,
+    func,
+    literal_column,
+    text,
+    update,
+)
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.sql.compiler import Compiled
+from sqlmodel import Session, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from src.models.post import Post
+from src.models.vote import Vote
+from src.services.ranking import hot_rank_expression
+from src.services.leaderboard import bucket_upsert, vote_day_expression
+from src.services.score_shards import (
+    SCORE_SHARDS,
+    random_shard,
+    score_expression,
+    shard_upsert,
+)
+
+# the vote statements take their values as parameters, see apply_vote_change
+USER_ID = bindparam("user_id", type_=sa.Integer)
+POST_ID = bindparam("post_id", type_=sa.Integer)
+VOTE_TYPE = bindparam("vote_type", type_=sa.Integer)
+SHARD = bindparam("shard", type_=sa.Integer)
+
+
+def upsert_vote():
+    """
+    Vote change CTE that casts or flips the vote of user_id on a live post.
+
+    A vote is either 1 or -1, so the previous value follows from whether the
+    row was inserted or updated. Re-casting the same vote matches no row and
+    changes nothing. Concurrent first votes are settled by the conflict
+    clause instead of failing on unique_user_post_vote.
+    """
+    statement = insert(Vote).from_select(
+        ["user_id", "post_id", "vote_type"],
+        select(USER_ID, Post.id, VOTE_TYPE)
+        .where(Post.id == POST_ID)
+        .where(Post.deleted == False),
+    )
+    statement = statement.on_conflict_do_update(
+        constraint="unique_user_post_vote",
+        set_={"vote_type": statement.excluded.vote_type, "updated_at": func.now()},
+        where=Vote.vote_type != statement.excluded.vote_type,
+    )
+    # the insert draws an id even when it ends in the conflict update, so only
+    # a row inserted here has the id this session drew last. xmax = 0 would
+    # tell the same, but system columns can not be returned once vote is
+    # partitioned
+    inserted = Vote.id == func.currval(func.pg_get_serial_sequence("vote", "id"))
+    return statement.returning(
+        Vote.post_id,
+        case((inserted, literal_column("0")), else_=-Vote.vote_type).label("old_vote"),
+        Vote.vote_type.label("new_vote"),
+        Vote.created_at,
+    ).cte("change")
+
+
+def delete_vote():
+    """Vote change CTE that removes the vote of user_id, if there is one"""
+    return (
+        delete(Vote)
+        .where(Vote.user_id == USER_ID)
+        .where(Vote.post_id == POST_ID)
+        .returning(
+            Vote.post_id,
+            Vote.vote_type.label("old_vote"),
+            literal_column("0").label("new_vote"),
+            Vote.created_at,
+        )
+        .cte("change")
+    )
+
+
+def vote_change_statement(change):
+    """
+    Statement that writes a vote change and adjusts the denormalized counters
+    of the post, selecting the new score.
+
+    change is a CTE from upsert_vote or delete_vote returning (post_id,
+    old_vote, new_vote, created_at) for the vote row it touched, or nothing
+    when the vote did not change. The leaderboard bucket of the day the vote
+    was first cast is updated in the same statement. With SCORE_SHARDS set
+    the deltas go to a shard row instead of the post row and the bucket,
+    compaction folds them in later.
+    """
+    delta = change.c.new_vote - change.c.old_vote
+    upvotes = case((change.c.new_vote == 1, 1), else_=0) - case(
+        (change.c.old_vote == 1, 1), else_=0
+    )
+    downvotes = case((change.c.new_vote == -1, 1), else_=0) - case(
+        (change.c.old_vote == -1, 1), else_=0
+    )
+
+    if SCORE_SHARDS:
+        shard = shard_upsert(
+            select(
+                change.c.post_id,
+                vote_day_expression(change.c.created_at),
+                SHARD,
+                delta,
+                upvotes,
+                downvotes,
+            )
+        )
+        # the shard write is not visible to the rest of the statement, so the
+        # delta is added on top of the score read here. An aggregate without
+        # GROUP BY always yields one row, so an unchanged vote adds 0.
+        pending = select(func.coalesce(func.sum(delta), 0)).scalar_subquery()
+        return (
+            select(score_expression() + pending)
+            .where(Post.id == POST_ID)
+            .where(Post.deleted == False)
+            .add_cte(change)
+            .add_cte(shard.cte("shard"))
+        )
+
+    bucket = bucket_upsert(
+        select(vote_day_expression(change.c.created_at), change.c.post_id, delta)
+    )
+
+    # the post row is only updated (and locked) when the vote changed,
+    # otherwise its stored score is returned as is
+    score = Post.score + delta
+    updated = (
+        update(Post)
+        .where(Post.id == change.c.post_id)
+        .where(Post.deleted == False)
+        .values(
+            score=score,
+            hot_rank=hot_rank_expression(score, Post.created_at),
+            upvotes=Post.upvotes + upvotes,
+            downvotes=Post.downvotes + downvotes,
+        )
+        .returning(Post.score)
+        .cte("updated")
+    )
+    return (
+        select(func.coalesce(select(updated.c.score).scalar_subquery(), Post.score))
+        .where(Post.id == POST_ID)
+        .where(Post.deleted == False)
+        .add_cte(change)
+        .add_cte(bucket.cte("bucket"))
+        .add_cte(updated)
+    )
+
+
+# postgresql's insert() opts out of SQLAlchemy's compiled statement cache, so
+# every vote built and compiled its statement again, which took longer than
+# running it. Only the parameters differ between votes, so the two statements
+# are compiled once.
+compiled_statements: Dict[bool, Compiled] = {}
+
+
+async def apply_vote_change(
+    session: AsyncSession, user_id: int, post_id: int, vote_type: Optional[int]
+) -> Optional[int]:
+    """
+    Cast (or with None remove) a vote and adjust the counters of the post in
+    a single statement, see vote_change_statement. Nothing is committed here.
+    Returns the new score, or None if the post does not exist or was deleted.
+    """
+    connection = await session.connection()
+    remove = vote_type is None
+    compiled = compiled_statements.get(remove)
+    if compiled is None:
+        change = delete_vote() if remove else upsert_vote()
+        compiled = vote_change_statement(change).compile(dialect=connection.dialect)
+        compiled_statements[remove] = compiled
+
+    params = compiled.construct_params(
+        {
+            "user_id": user_id,
+            "post_id": post_id,
+            "vote_type": vote_type,
+            "shard": random_shard() if SCORE_SHARDS else 0,
+        }
+    )
+    result = await connection.exec_driver_sql(
+        compiled.string, tuple(params[name] for name in compiled.positiontup)
+    )
+    row = result.one_or_none()
+    return None if row is None else row[0]
+
+
+async def get_user_votes(
+    session: AsyncSession, user_id: int, post_ids: List[int]
+) -> Dict[int, int]:
+    """Get a user's votes on the given posts as {post_id: vote_type}"""
+    if not post_ids:
+        return {}
+    votes = (
+        await session.exec(
+            select(Vote.post_id, Vote.vote_type)
+            .where(Vote.user_id == user_id)
+            .where(Vote.post_id.in_(post_ids))
+        )
+    ).all()
+    return dict(votes)
+
+
+def partition_vote_table(session: Session, partitions: int) -> int:
+    """
+    Rebuild the vote table as hash partitioned on post_id, so the votes of a
+    post live in one partition of a manageable size. The primary key becomes
+    (id, post_id) since postgres needs the partition key in every unique
+    constraint. The whole table is locked and copied in one transaction, run
+    it during a quiet period. Returns the number of votes copied.
+    """
+    session.exec(text("LOCK TABLE vote IN ACCESS EXCLUSIVE MODE"))
+    session.exec(text("ALTER TABLE vote RENAME TO vote_unpartitioned"))
+    session.exec(
+        text(
+            """
+            CREATE TABLE vote (
+                LIKE vote_unpartitioned INCLUDING DEFAULTS INCLUDING CONSTRAINTS
+            ) PARTITION BY HASH (post_id)
+            """
+        )
+    )
+    for remainder in range(partitions):
+        session.exec(
+            text(
+                f"CREATE TABLE vote_p{remainder} PARTITION OF vote "
+                f"FOR VALUES WITH (MODULUS {partitions}, REMAINDER {remainder})"
+            )
+        )
+    result = session.exec(text("INSERT INTO vote SELECT * FROM vote_unpartitioned"))
+    # keep the id sequence alive when the old table is dropped
+    session.exec(text("ALTER SEQUENCE vote_id_seq OWNED BY vote.id"))
+    session.exec(text("DROP TABLE vote_unpartitioned"))
+    for statement in (
+        "ALTER TABLE vote ADD CONSTRAINT vote_pkey PRIMARY KEY (id, post_id)",
+        "ALTER TABLE vote ADD CONSTRAINT unique_user_post_vote "
+        "UNIQUE (user_id, post_id)",
+        "ALTER TABLE vote ADD CONSTRAINT vote_post_id_fkey "
+        "FOREIGN KEY (post_id) REFERENCES post (id)",
+        'ALTER TABLE vote ADD CONSTRAINT vote_user_id_fkey '
+        'FOREIGN KEY (user_id) REFERENCES "user" (id)',
+        "CREATE INDEX ix_vote_post_id_user_id ON vote (post_id, user_id) "
+        "INCLUDE (vote_type)",
+    ):
+        session.exec(text(statement))
+    session.commit()
+    return result.rowcount
@@ -0,0 +1,197 @@
+import asyncio
+import os
+import time
+from typing import Optional, Set, Tuple
+from dotenv import load_dotenv, find_dotenv
+from starlette.concurrency import run_in_threadpool
+
+load_dotenv(find_dotenv())
+
+# where the waitlist is synced from: "supabase" or "file"
+WAITLIST_SOURCE = os.getenv("WAITLIST_SOURCE", "supabase").lower()
+# one hashed google id per line, for WAITLIST_SOURCE="file"
+WAITLIST_FILE = os.getenv("WAITLIST_FILE", "waitlist.txt")
+WAITLIST_SYNC_SECONDS = float(os.getenv("WAITLIST_SYNC_SECONDS", "300"))
+# ask the source directly when a google id is not in the local index
+WAITLIST_REMOTE_FALLBACK = (
+    os.getenv("WAITLIST_REMOTE_FALLBACK", "true").lower() == "true"
+)
+SUPABASE_PAGE_SIZE = 1000
+
+
+class SupabaseWaitlistSource:
+    """The waitlist_users table of the waitlist app"""
+
+    def __init__(self, url: str, key: str):
+        from supabase import create_client
+
+        self.client = create_client(url, key)
+
+    def load(self) -> Set[str]:
+        hashes: Set[str] = set()
+        start = 0
+        while True:
+            rows = (
+                self.client.table("waitlist_users")
+                .select("hashed_google_id")
+                .order("hashed_google_id")
+                .range(start, start + SUPABASE_PAGE_SIZE - 1)
+                .execute()
+            ).data
+            hashes.update(row["hashed_google_id"] for row in rows)
+            if len(rows) < SUPABASE_PAGE_SIZE:
+                return hashes
+            start += SUPABASE_PAGE_SIZE
+
+    def contains(self, hashed_google_id: str) -> bool:
+        rows = (
+            self.client.table("waitlist_users")
+            .select("hashed_google_id")
+            .eq("hashed_google_id", hashed_google_id)
+            .execute()
+        ).data
+        return bool(rows)
+
+
+class FileWaitlistSource:
+    """
+    A local file with one hashed google id per line. The file is parsed
+    again only when its modification time or size changed, so a lookup
+    that misses the index costs a stat rather than a read of the file.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._stamp: Optional[Tuple[int, int]] = None
+        self._hashes: Set[str] = set()
+
+    def _refresh(self) -> None:
+        stat = os.stat(self.path)
+        stamp = (stat.st_mtime_ns, stat.st_size)
+        if stamp != self._stamp:
+            with open(self.path, encoding="utf-8") as f:
+                self._hashes = {line.strip() for line in f if line.strip()}
+            self._stamp = stamp
+
+    def load(self) -> Set[str]:
+        self._refresh()
+        # the index adds to the set it is given
+        return set(self._hashes)
+
+    def contains(self, hashed_google_id: str) -> bool:
+        self._refresh()
+        return hashed_google_id in self._hashes
+
+
+def create_waitlist_source():
+    if WAITLIST_SOURCE == "file":
+        return FileWaitlistSource(WAITLIST_FILE)
+    if WAITLIST_SOURCE == "supabase":
+        url = os.getenv("SUPABASE_URL")
+        key = os.getenv("SUPABASE_SERVICE_ROLE_KEY")
+        if not all([url, key]):
+            raise ValueError(
+                "Missing Supabase environment variables for waitlist check."
+            )
+        return SupabaseWaitlistSource(url, key)
+    raise ValueError(f"Unknown WAITLIST_SOURCE: {WAITLIST_SOURCE}")
+
+
+class WaitlistIndex:
+    """
+    In-memory copy of the hashed google ids on the waitlist, so a signup
+    is a set lookup instead of a query to the waitlist app.
+
+    The index is loaded at startup and replaced by a full sync every
+    sync_interval seconds. Someone who joins the waitlist between two
+    syncs is not in the index yet, with remote_fallback a miss asks the
+    source before turning them away. Until the first sync succeeds every
+    lookup goes to the source.
+    """
+
+    def __init__(self, source, sync_interval: float, remote_fallback: bool = True):
+        self.source = source
+        self.sync_interval = sync_interval
+        self.remote_fallback = remote_fallback
+        self.hashes: Set[str] = set()
+        self.loaded = False
+        self.task: Optional[asyncio.Task] = None
+        self.syncs = 0
+        self.failed_syncs = 0
+        self.last_sync_ms = 0.0
+        self.hits = 0
+        self.misses = 0
+        self.remote_lookups = 0
+        self.remote_hits = 0
+
+    async def sync(self) -> int:
+        started = time.perf_counter()
+        hashes = await run_in_threadpool(self.source.load)
+        self.hashes = hashes
+        self.loaded = True
+        self.last_sync_ms = round((time.perf_counter() - started) * 1000, 2)
+        self.syncs += 1
+        return len(hashes)
+
+    async def try_sync(self) -> None:
+        try:
+            await self.sync()
+        except Exception as e:
+            print(f"Error syncing the waitlist: {e}")
+            self.failed_syncs += 1
+
+    async def contains(self, hashed_google_id: str) -> bool:
+        if hashed_google_id in self.hashes:
+            self.hits += 1
+            return True
+        self.misses += 1
+        if self.loaded and not self.remote_fallback:
+            return False
+        self.remote_lookups += 1
+        found = await run_in_threadpool(self.source.contains, hashed_google_id)
+        if found:
+            self.remote_hits += 1
+            self.hashes.add(hashed_google_id)
+        return found
+
+    async def run(self) -> None:
+        while True:
+            await asyncio.sleep(self.sync_interval)
+            await self.try_sync()
+
+    async def start(self) -> None:
+        if self.task is None:
+            await self.try_sync()
+            self.task = asyncio.create_task(self.run())
+
+    async def stop(self) -> None:
+        if self.task is not None:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+            self.task = None
+
+    def stats(self) -> dict:
+        return {
+            "source": type(self.source).__name__,
+            "loaded": self.loaded,
+            "size": len(self.hashes),
+            "sync_interval": self.sync_interval,
+            "remote_fallback": self.remote_fallback,
+            "syncs": self.syncs,
+            "failed_syncs": self.failed_syncs,
+            "last_sync_ms": self.last_sync_ms,
+            "hits": self.hits,
+            "misses": self.misses,
+            "remote_lookups": self.remote_lookups,
+            "remote_hits": self.remote_hits,
+        }
+
+
+waitlist_index = WaitlistIndex(
+    source=create_waitlist_source(),
+    sync_interval=WAITLIST_SYNC_SECONDS,
+    remote_fallback=WAITLIST_REMOTE_FALLBACK,
+)
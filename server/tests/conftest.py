@@ -0,0 +1,150 @@
+"""
+The tests run against a real Postgres database given by TEST_DATABASE_URL,
+e.g. postgresql://postgres@127.0.0.1:5432/anon_test. Its tables are dropped
+and recreated, never point it at a database you care about. Without it
+every test that needs the database is skipped.
+"""
+
+import os
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from cryptography.fernet import Fernet
+
+TEST_DATABASE_URL = os.getenv("TEST_DATABASE_URL")
+
+# src reads its settings at import time, so they are set before importing it
+os.environ["DATABASE_URL"] = TEST_DATABASE_URL or "postgresql://localhost/anon_test"
+os.environ.pop("READ_DATABASE_URL", None)
+os.environ.pop("ASYNC_READ_DATABASE_URL", None)
+for name, value in {
+    "JWT_SECRET_KEY": "test-secret",
+    "GOOGLE_CLIENT_ID": "test-client-id",
+    "GOOGLE_CLIENT_SECRET": "test-client-secret",
+    "GOOGLE_REDIRECT_URI": "http://127.0.0.1:8000/auth/google/callback",
+    "REFRESH_TOKEN_ENCRYPTION_KEY": Fernet.generate_key().decode(),
+    "IDENTIFIER_HASH_SECRET": "test-hash-secret",
+    "WAITLIST_SOURCE": "file",
+    "WAITLIST_FILE": os.devnull,
+}.items():
+    os.environ.setdefault(name, value)
+
+import jwt  # noqa: E402
+from fastapi.testclient import TestClient  # noqa: E402
+from sqlalchemy import event, text  # noqa: E402
+from sqlmodel import Session, SQLModel  # noqa: E402
+
+from src.db import engine, async_engine, recent_writers  # noqa: E402
+from src.main import app  # noqa: E402
+from src.models.post import Post  # noqa: E402
+from src.models.user import User  # noqa: E402
+from src.services.auth import principal_cache, token_versions  # noqa: E402
+from src.services.counts import count_estimates  # noqa: E402
+from src.services.feed_cache import feed_cache  # noqa: E402
+
+
+@pytest.fixture(scope="session")
+def database():
+    if not TEST_DATABASE_URL:
+        pytest.skip("TEST_DATABASE_URL is not set")
+    SQLModel.metadata.drop_all(engine)
+    SQLModel.metadata.create_all(engine)
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def db(database):
+    """A sync session on an empty database"""
+    tables = ", ".join(
+        f'"{table.name}"' for table in SQLModel.metadata.sorted_tables
+    )
+    with database.begin() as connection:
+        connection.execute(text(f"TRUNCATE {tables} RESTART IDENTITY CASCADE"))
+    for cache in (
+        feed_cache,
+        principal_cache,
+        token_versions,
+        recent_writers,
+        count_estimates,
+    ):
+        cache.clear()
+    with Session(database) as session:
+        yield session
+
+
+@pytest.fixture
+def client(db):
+    with TestClient(app) as client:
+        yield client
+
+
+@pytest.fixture
+def create_user(db):
+    def create_user(username: str) -> User:
+        user = User(username=username, google_id=f"google-{username}")
+        db.add(user)
+        db.commit()
+        db.refresh(user)
+        return user
+
+    return create_user
+
+
+@pytest.fixture
+def create_post(db):
+    def create_post(author: User) -> Post:
+        post = Post(content="post", author_id=author.id)
+        db.add(post)
+        db.commit()
+        db.refresh(post)
+        return post
+
+    return create_post
+
+
+def login(client: TestClient, user: User) -> None:
+    """Make the client send an access token for user"""
+    token = jwt.encode(
+        {
+            "sub": str(user.id),
+            "ver": user.token_version,
+            "exp": datetime.now(timezone.utc) + timedelta(hours=1),
+        },
+        os.environ["JWT_SECRET_KEY"],
+        algorithm="HS256",
+    )
+    client.cookies.set("access_token", token)
+
+
+def create_posts(client: TestClient, count: int) -> list:
+    """Post count posts as the logged in user, returns their ids"""
+    post_ids = []
+    for i in range(count):
+        response = client.post("/posts/", json={"content": f"post {i}"})
+        assert response.status_code == 200
+        post_ids.append(response.json()["id"])
+    return post_ids
+
+
+@pytest.fixture
+def count_queries(database):
+    """Context manager collecting the statements the routes send"""
+
+    @contextmanager
+    def count_queries():
+        statements = []
+
+        def before_cursor_execute(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        event.listen(async_engine.sync_engine, "before_cursor_execute", before_cursor_execute)
+        try:
+            yield statements
+        finally:
+            event.remove(
+                async_engine.sync_engine, "before_cursor_execute", before_cursor_execute
+            )
+
+    return count_queries
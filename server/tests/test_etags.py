@@ -0,0 +1,32 @@
+from tests.conftest import create_posts, login
+
+
+def test_profile_listing_revalidates_without_loading_posts(
+    client, create_user, count_queries
+):
+    author = create_user("author")
+    viewer = create_user("viewer")
+    login(client, author)
+    post_ids = create_posts(client, 3)
+
+    login(client, viewer)
+    response = client.get("/posts/user/author")
+    assert response.status_code == 200
+    etag = response.headers["etag"]
+
+    with count_queries() as statements:
+        response = client.get("/posts/user/author", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert not any("post.content" in statement for statement in statements)
+
+    # the viewer's own vote changes the page they see
+    assert client.put(f"/posts/{post_ids[0]}/vote", json={"vote_type": 1}).status_code == 200
+    response = client.get("/posts/user/author", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["etag"] != etag
+    assert response.json()["items"][-1]["user_vote"] == 1
+
+    response = client.get(
+        "/posts/user/author", headers={"If-None-Match": response.headers["etag"]}
+    )
+    assert response.status_code == 304
@@ -0,0 +1,36 @@
+from src.models.post import Post
+from src.routes import posts
+from src.services.feed_cache import feed_cache, invalidate_feed
+from tests.conftest import create_posts, login
+
+
+def test_page_built_across_a_new_post_is_not_cached(
+    client, db, create_user, monkeypatch
+):
+    author = create_user("author")
+    login(client, author)
+    create_posts(client, 2)
+    build_feed_page = posts.build_feed_page
+
+    async def build_then_post(*args, **kwargs):
+        page = await build_feed_page(*args, **kwargs)
+        # another request commits a post while this page is being built
+        db.add(Post(content="late post", author_id=author.id))
+        db.commit()
+        invalidate_feed()
+        return page
+
+    monkeypatch.setattr(posts, "build_feed_page", build_then_post)
+    response = client.get("/posts/")
+    assert response.status_code == 200
+    assert len(response.json()["items"]) == 2
+    assert feed_cache.stats()["size"] == 0
+
+    monkeypatch.setattr(posts, "build_feed_page", build_feed_page)
+    response = client.get("/posts/")
+    assert "late post" in [item["content"] for item in response.json()["items"]]
+
+
+def test_metrics_are_not_mounted_by_default(client, create_user):
+    login(client, create_user("viewer"))
+    assert client.get("/metrics/").status_code == 404
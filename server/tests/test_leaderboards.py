@@ -0,0 +1,98 @@
+import threading
+import time as clock
+from datetime import datetime, time, timedelta, timezone
+from sqlalchemy import event, text
+from sqlmodel import select
+from src.models.leaderboard import PostDailyScore
+from src.models.post import Post
+from src.models.score_shard import PostScoreShard
+from src.models.vote import Vote
+from src.services.leaderboard import RETENTION_DAYS, rebuild_leaderboards, today
+from src.services.score_shards import compact_score_shards
+
+
+def buckets(db):
+    return db.exec(
+        select(PostDailyScore.day, PostDailyScore.post_id, PostDailyScore.score)
+    ).all()
+
+
+def test_rebuild_does_not_count_pending_shards_twice(db, create_user, create_post):
+    voter = create_user("voter")
+    post = create_post(voter)
+    # a vote whose delta is still waiting in a shard for compaction
+    db.add(Vote(user_id=voter.id, post_id=post.id, vote_type=1))
+    db.add(PostScoreShard(post_id=post.id, day=today(), shard=0, score=1, upvotes=1))
+    db.commit()
+
+    rebuild_leaderboards(db)
+    compact_score_shards(db)
+
+    assert buckets(db) == [(today(), post.id, 1)]
+    assert db.get(Post, post.id).score == 1
+
+
+def test_rebuild_cutoff_uses_utc_days(db, create_user, create_post):
+    voter = create_user("voter")
+    post = create_post(voter)
+    first_day = today() - timedelta(days=RETENTION_DAYS - 1)
+    created_at = datetime.combine(first_day, time(0, 30), tzinfo=timezone.utc)
+    db.add(Vote(user_id=voter.id, post_id=post.id, vote_type=1, created_at=created_at))
+    db.commit()
+
+    # midnight in this zone is well after 00:30 UTC
+    db.exec(text("SET LOCAL TIME ZONE 'America/New_York'"))
+    rebuild_leaderboards(db)
+
+    assert buckets(db) == [(first_day, post.id, 1)]
+
+
+def test_rebuild_with_a_vote_committing_after_the_delete(
+    db, database, create_user, create_post
+):
+    voter = create_user("voter")
+    post = create_post(voter)
+
+    def vote() -> None:
+        # a first vote on the post today, which opens the post's bucket
+        with database.begin() as connection:
+            connection.execute(
+                text("INSERT INTO vote (user_id, post_id, vote_type) VALUES (:user, :post, 1)"),
+                {"user": voter.id, "post": post.id},
+            )
+            connection.execute(
+                text("INSERT INTO post_daily_score (day, post_id, score) VALUES (:day, :post, 1)"),
+                {"day": today(), "post": post.id},
+            )
+
+    def vote_after_delete(conn, cursor, statement, *args) -> None:
+        if not statement.startswith("DELETE FROM post_daily_score"):
+            return
+        voting = threading.Thread(target=vote)
+        voting.start()
+        # go on once the vote committed or waits for the rebuild's lock
+        with database.connect() as monitor:
+            while voting.is_alive():
+                waiting = monitor.execute(
+                    text(
+                        "SELECT count(*) FROM pg_stat_activity "
+                        "WHERE datname = current_database() AND wait_event_type = 'Lock'"
+                    )
+                ).scalar_one()
+                monitor.rollback()
+                if waiting:
+                    break
+                clock.sleep(0.01)
+        threads.append(voting)
+
+    threads = []
+    connection = db.connection()
+    event.listen(connection, "after_cursor_execute", vote_after_delete)
+    try:
+        rebuild_leaderboards(db)
+    finally:
+        event.remove(connection, "after_cursor_execute", vote_after_delete)
+    for voting in threads:
+        voting.join()
+
+    assert buckets(db) == [(today(), post.id, 1)]
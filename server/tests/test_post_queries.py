@@ -0,0 +1,70 @@
+from src.services.counts import count_estimates
+from tests.conftest import create_posts, login
+
+
+def test_profile_listing_query_count_does_not_depend_on_page_size(
+    client, create_user, count_queries
+):
+    author = create_user("author")
+    viewer = create_user("viewer")
+    login(client, author)
+    create_posts(client, 20)
+
+    login(client, viewer)
+    # fills the token version cache, so both pages below start from the same state
+    assert client.get("/posts/user/author?limit=1").status_code == 200
+
+    query_counts = []
+    for limit in (5, 20):
+        with count_queries() as statements:
+            response = client.get(f"/posts/user/author?limit={limit}")
+        assert response.status_code == 200
+        assert len(response.json()["items"]) == limit
+        query_counts.append(len(statements))
+
+    assert query_counts[0] == query_counts[1]
+
+
+def test_batch_lookup_query_count_does_not_depend_on_id_count(
+    client, create_user, count_queries
+):
+    author = create_user("author")
+    login(client, author)
+    create_posts(client, 20)
+    assert client.get("/posts/batch?ids=1").status_code == 200
+
+    query_counts = []
+    for count in (2, 20):
+        ids = ",".join(str(post_id) for post_id in range(1, count + 1))
+        with count_queries() as statements:
+            response = client.get(f"/posts/batch?ids={ids}")
+        assert response.status_code == 200
+        assert len(response.json()["items"]) == count
+        query_counts.append(len(statements))
+
+    assert query_counts[0] == query_counts[1]
+
+
+def test_batch_lookup_reports_out_of_range_ids_as_missing(client, create_user):
+    login(client, create_user("author"))
+    [post_id] = create_posts(client, 1)
+
+    response = client.get(f"/posts/batch?ids={post_id},99999999999,0,-5")
+    assert response.status_code == 200
+    body = response.json()
+    assert [item["id"] for item in body["items"]] == [post_id]
+    assert body["missing"] == [99999999999, 0, -5]
+
+
+def test_only_estimated_counts_are_kept(client, create_user):
+    login(client, create_user("author"))
+    create_posts(client, 2)
+
+    assert client.get("/posts/user/author?count=exact").json()["total"] == 2
+    assert count_estimates.stats()["size"] == 0
+
+    assert client.get("/posts/user/author?count=estimated").json()["total"] == 2
+    create_posts(client, 1)
+    # served from memory until the estimate expires
+    assert client.get("/posts/user/author?count=estimated").json()["total"] == 2
+    assert client.get("/posts/user/author?count=exact").json()["total"] == 3
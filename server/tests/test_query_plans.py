@@ -0,0 +1,51 @@
+from datetime import datetime, timezone
+import pytest
+from sqlalchemy import text
+from src.models.post import Post
+from src.routes.posts import (
+    author_page,
+    feed_page,
+    search_page,
+    select_posts,
+    select_posts_public,
+)
+
+
+@pytest.fixture
+def posts(db, create_user):
+    authors = [create_user(f"author{i}") for i in range(10)]
+    db.add_all(
+        Post(content=f"post {i}", author_id=authors[i % 10].id, deleted=i % 7 == 0)
+        for i in range(500)
+    )
+    db.commit()
+    db.exec(text("ANALYZE"))
+    return authors
+
+
+def plan(db, statement) -> str:
+    # the tables are tiny, without this the planner would just scan them
+    db.exec(text("SET LOCAL enable_seqscan = off"))
+    compiled = statement.compile(db.get_bind())
+    rows = db.connection().exec_driver_sql(f"EXPLAIN {compiled}", compiled.params)
+    return "\n".join(row[0] for row in rows)
+
+
+def test_feed_uses_the_live_created_at_index(db, posts):
+    assert "ix_post_live_created_at_id" in plan(db, feed_page(select_posts(), 10, 0, None))
+
+
+def test_feed_cursor_uses_the_live_created_at_index(db, posts):
+    position = (datetime.now(timezone.utc), 250)
+    statement = feed_page(select_posts(), 10, 0, position)
+    assert "ix_post_live_created_at_id" in plan(db, statement)
+
+
+def test_profile_listing_uses_the_live_author_index(db, posts):
+    statement = author_page(select_posts_public(posts[0].id), posts[3].id, 10, 0)
+    assert "ix_post_live_author_created_at_id" in plan(db, statement)
+
+
+def test_search_uses_the_stored_vector_index(db, posts):
+    statement = search_page(select_posts_public(posts[0].id), "42", 10, 0)
+    assert "ix_post_search_vector" in plan(db, statement)
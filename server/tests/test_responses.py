@@ -0,0 +1,23 @@
+from datetime import datetime, timezone
+import orjson
+from fastapi.encoders import jsonable_encoder
+from src.models.post import Author, PostPublic
+from src.routes.posts import PaginatedResponse
+from src.services.responses import fast_response
+
+
+def test_fast_response_matches_the_validated_encoding():
+    post = PostPublic.model_construct(
+        id=1,
+        content="hello",
+        created_at=datetime(2026, 10, 18, 12, 30, 5, 123456, tzinfo=timezone.utc),
+        author=Author.model_construct(author_id=2, username="someone", avatar_seed=None),
+        score=3,
+        user_vote=-1,
+    )
+    page = PaginatedResponse.model_construct(
+        items=[post], total=1, limit=10, offset=0, next_cursor=None
+    )
+    body = orjson.loads(fast_response(page).body)
+    assert body == jsonable_encoder(PaginatedResponse[PostPublic].model_validate(page.model_dump()))
+    assert body["items"][0]["created_at"] == "2026-10-18T12:30:05.123456Z"
@@ -0,0 +1,34 @@
+from sqlalchemy import func
+from src.routes import posts
+from src.routes.posts import search_page, select_posts_public
+from src.services import search
+from tests.conftest import create_posts, login
+
+
+def test_search_ranks_only_the_newest_matches(client, db, create_user):
+    viewer = create_user("viewer")
+    login(client, viewer)
+    # the oldest post matches best, but it is not among the newest three
+    client.post("/posts/", json={"content": "exam exam exam exam"})
+    for i in range(4):
+        client.post("/posts/", json={"content": f"exam number {i}"})
+
+    statement = search_page(select_posts_public(viewer.id), "exam", 10, 0, candidates=3)
+    rows = db.exec(statement).all()
+    assert sorted(row[0].id for row in rows) == [3, 4, 5]
+
+    response = client.get("/posts/search?q=exam")
+    assert response.status_code == 200
+    assert response.json()["items"][0]["id"] == 1
+
+
+def test_slow_search_times_out(client, create_user, monkeypatch):
+    login(client, create_user("viewer"))
+    create_posts(client, 1)
+
+    def slow_search_page(*args, **kwargs):
+        return search_page(*args, **kwargs).where(func.pg_sleep(1) != None)
+
+    monkeypatch.setattr(search, "SEARCH_TIMEOUT_MS", 50)
+    monkeypatch.setattr(posts, "search_page", slow_search_page)
+    assert client.get("/posts/search?q=post").status_code == 503
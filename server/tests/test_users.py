@@ -0,0 +1,30 @@
+from src.models.user import User
+from src.services.auth import principal_cache
+from tests.conftest import login
+
+
+def test_username_can_only_be_set_once_with_a_stale_principal(client, db, create_user):
+    user = create_user("placeholder")
+    user.username = None
+    db.add(user)
+    db.commit()
+    login(client, user)
+
+    assert client.get("/users/me").json()["username"] is None
+    # what another worker still has cached after the username is set
+    stale = dict(principal_cache.get(user.id))
+
+    response = client.patch(
+        "/users/me/username", json={"username": "first", "avatar_seed": "a"}
+    )
+    assert response.status_code == 200
+    assert response.json()["username"] == "first"
+
+    principal_cache.set(user.id, stale)
+    response = client.patch(
+        "/users/me/username", json={"username": "second", "avatar_seed": "b"}
+    )
+    assert response.status_code == 400
+
+    db.expire_all()
+    assert db.get(User, user.id).username == "first"
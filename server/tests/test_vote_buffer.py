@@ -0,0 +1,95 @@
+import asyncio
+from sqlmodel import select
+from src.db import async_session, close_db
+from src.models.vote import Vote
+from src.services import vote_buffer as vote_buffer_module
+from src.services.vote_buffer import VoteBuffer, vote_buffer
+from tests.conftest import create_posts, login
+
+
+def slow_writes(monkeypatch, seconds: float) -> None:
+    apply_vote_change = vote_buffer_module.apply_vote_change
+
+    async def slow_apply_vote_change(*args):
+        await asyncio.sleep(seconds)
+        return await apply_vote_change(*args)
+
+    monkeypatch.setattr(vote_buffer_module, "apply_vote_change", slow_apply_vote_change)
+
+
+def test_stop_waits_for_a_flush_in_progress(db, create_user, create_post, monkeypatch):
+    voter = create_user("voter")
+    post = create_post(voter)
+    slow_writes(monkeypatch, 0.2)
+
+    async def vote_and_shut_down():
+        buffer = VoteBuffer(max_size=100, flush_interval=0.01)
+        async with async_session() as session:
+            await buffer.submit(session, voter.id, post.id, 1)
+        buffer.start()
+        # let the periodic flush take the batch and block in the write
+        await asyncio.sleep(0.05)
+        assert not buffer.pending
+        await buffer.stop()
+        await close_db()
+        return buffer
+
+    buffer = asyncio.run(vote_and_shut_down())
+
+    assert buffer.flushed_votes == 1
+    assert db.exec(select(Vote.vote_type).where(Vote.post_id == post.id)).all() == [1]
+
+
+def test_cancelled_flush_puts_the_batch_back(db, create_user, create_post, monkeypatch):
+    voter = create_user("voter")
+    post = create_post(voter)
+    slow_writes(monkeypatch, 1)
+
+    async def cancel_flush():
+        buffer = VoteBuffer(max_size=100, flush_interval=60)
+        async with async_session() as session:
+            await buffer.submit(session, voter.id, post.id, -1)
+        flush = asyncio.create_task(buffer.flush())
+        await asyncio.sleep(0.05)
+        flush.cancel()
+        await asyncio.gather(flush, return_exceptions=True)
+        await close_db()
+        return buffer
+
+    buffer = asyncio.run(cancel_flush())
+
+    assert list(buffer.pending) == [(voter.id, post.id)]
+    assert buffer.pending_deltas[post.id] == -1
+
+
+def test_viewer_sees_their_buffered_vote(client, create_user, monkeypatch):
+    login(client, create_user("voter"))
+    [post_id] = create_posts(client, 1)
+    # the periodic flush was not started, the vote stays in the buffer
+    monkeypatch.setattr(vote_buffer, "enabled", True)
+
+    assert client.put(f"/posts/{post_id}/vote", json={"vote_type": -1}).status_code == 200
+    assert len(vote_buffer.pending) == 1
+    assert client.get(f"/posts/{post_id}").json()["user_vote"] == -1
+    assert client.get("/posts/").json()["items"][0]["user_vote"] == -1
+    assert client.get("/posts/user/voter").json()["items"][0]["user_vote"] == -1
+
+
+def test_full_buffer_writes_votes_through(db, create_user, create_post):
+    voter = create_user("voter")
+    first, second = create_post(voter), create_post(voter)
+
+    async def vote_twice():
+        buffer = VoteBuffer(max_size=100, flush_interval=60, max_depth=1)
+        async with async_session() as session:
+            await buffer.submit(session, voter.id, first.id, 1)
+        async with async_session() as session:
+            await buffer.submit(session, voter.id, second.id, 1)
+        await close_db()
+        return buffer
+
+    buffer = asyncio.run(vote_twice())
+
+    assert list(buffer.pending) == [(voter.id, first.id)]
+    assert buffer.written_through == 1
+    assert db.exec(select(Vote.post_id)).all() == [second.id]
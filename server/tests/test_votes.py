@@ -0,0 +1,103 @@
+import pytest
+from sqlalchemy import text
+from sqlmodel import SQLModel
+from src.services.score_shards import SCORE_SHARDS, compact_score_shards
+from src.services.vote_buffer import VOTE_BUFFER_ENABLED
+from src.services.votes import partition_vote_table
+from tests.conftest import create_posts, login
+
+
+# buffered votes reach the post counters when the buffer is flushed
+writes_counters = pytest.mark.skipif(
+    VOTE_BUFFER_ENABLED, reason="the vote buffer writes the counters later"
+)
+
+
+def post_row(db, post_id):
+    if SCORE_SHARDS:
+        compact_score_shards(db)
+    return db.exec(
+        text("SELECT xmin::text, score, upvotes, downvotes FROM post WHERE id = :id"),
+        params={"id": post_id},
+    ).one()
+
+
+def vote(client, post_id, vote_type):
+    if vote_type is None:
+        response = client.delete(f"/posts/{post_id}/vote")
+    else:
+        response = client.put(f"/posts/{post_id}/vote", json={"vote_type": vote_type})
+    assert response.status_code == 200
+    return response.json()["post"]["score"]
+
+
+@pytest.fixture
+def partitioned_votes(db):
+    partition_vote_table(db, 4)
+    yield
+    db.close()
+    SQLModel.metadata.drop_all(db.get_bind())
+    SQLModel.metadata.create_all(db.get_bind())
+
+
+@writes_counters
+def test_votes_keep_the_post_counters_in_step(client, db, create_user):
+    login(client, create_user("author"))
+    [post_id] = create_posts(client, 1)
+
+    assert vote(client, post_id, 1) == 1
+    assert vote(client, post_id, -1) == -1
+    assert post_row(db, post_id)[1:] == (-1, 0, 1)
+    assert vote(client, post_id, None) == 0
+    assert post_row(db, post_id)[1:] == (0, 0, 0)
+
+
+def test_unchanged_vote_does_not_write_the_post(client, db, create_user):
+    login(client, create_user("author"))
+    [post_id] = create_posts(client, 1)
+    assert vote(client, post_id, 1) == 1
+    before = post_row(db, post_id)
+    db.rollback()
+
+    assert vote(client, post_id, 1) == 1
+    assert post_row(db, post_id) == before
+    db.rollback()
+
+    # removing a vote that does not exist leaves the post alone as well
+    assert vote(client, post_id, None) == 0
+    removed = post_row(db, post_id)
+    db.rollback()
+    assert vote(client, post_id, None) == 0
+    assert post_row(db, post_id) == removed
+
+
+def test_vote_on_missing_post_is_not_found(client, create_user):
+    login(client, create_user("voter"))
+    response = client.put("/posts/12345/vote", json={"vote_type": 1})
+    assert response.status_code == 404
+
+
+def test_out_of_range_post_ids_are_rejected(client, create_user):
+    login(client, create_user("voter"))
+    # post.id is an int4, a larger id must not reach asyncpg
+    for post_id in (0, 2**31):
+        assert client.get(f"/posts/{post_id}").status_code == 422
+        assert client.delete(f"/posts/{post_id}").status_code == 422
+        response = client.put(f"/posts/{post_id}/vote", json={"vote_type": 1})
+        assert response.status_code == 422
+        assert client.delete(f"/posts/{post_id}/vote").status_code == 422
+    assert client.get(f"/posts/{2**31 - 1}").status_code == 404
+
+
+@writes_counters
+def test_votes_on_a_partitioned_vote_table(partitioned_votes, client, db, create_user):
+    login(client, create_user("author"))
+    [post_id] = create_posts(client, 1)
+
+    assert vote(client, post_id, 1) == 1
+    assert vote(client, post_id, -1) == -1
+    assert vote(client, post_id, -1) == -1
+    assert post_row(db, post_id)[1:] == (-1, 0, 1)
+    db.rollback()
+    assert vote(client, post_id, None) == 0
+    assert post_row(db, post_id)[1:] == (0, 0, 0)
@@ -0,0 +1,68 @@
+import asyncio
+from src.services.waitlist import FileWaitlistSource, WaitlistIndex
+
+
+class StubWaitlistSource:
+    """Stands in for the waitlist app, counting the lookups it answers"""
+
+    def __init__(self, hashes):
+        self.hashes = set(hashes)
+        self.lookups = []
+
+    def load(self):
+        return set(self.hashes)
+
+    def contains(self, hashed_google_id):
+        self.lookups.append(hashed_google_id)
+        return hashed_google_id in self.hashes
+
+
+def test_index_falls_back_to_the_source_and_syncs():
+    source = StubWaitlistSource({"early"})
+    index = WaitlistIndex(source, sync_interval=60)
+
+    async def signups():
+        await index.sync()
+        assert await index.contains("early")
+        assert source.lookups == []
+
+        # joined the waitlist after the sync
+        source.hashes.add("late")
+        assert await index.contains("late")
+        assert not await index.contains("stranger")
+        assert source.lookups == ["late", "stranger"]
+
+        # a sync replaces the index with the source's set
+        source.hashes = {"replaced"}
+        await index.sync()
+        assert index.hashes == {"replaced"}
+        assert await index.contains("replaced")
+        assert source.lookups == ["late", "stranger"]
+
+    asyncio.run(signups())
+    assert index.stats()["remote_hits"] == 1
+
+
+def test_index_without_fallback_only_asks_the_source_before_the_first_sync():
+    source = StubWaitlistSource({"early"})
+    index = WaitlistIndex(source, sync_interval=60, remote_fallback=False)
+
+    async def signups():
+        assert await index.contains("early")
+        await index.sync()
+        source.hashes.add("late")
+        assert not await index.contains("late")
+
+    asyncio.run(signups())
+    assert source.lookups == ["early"]
+
+
+def test_file_source_reads_the_file_again_once_it_changed(tmp_path):
+    path = tmp_path / "waitlist.txt"
+    path.write_text("first\n")
+    source = FileWaitlistSource(str(path))
+
+    assert source.load() == {"first"}
+    assert not source.contains("second")
+    path.write_text("first\nsecond\n")
+    assert source.contains("second")